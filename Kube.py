@@ -13,6 +13,19 @@ corresponding to a list consecutive fundamental moves
 
 solve: solves the Rubk's cube from a given state
 
+solve_iter: solves the Rubik's cube from a given state, yielding the moves 
+phase by phase as soon as they are found
+
+solve_many: solves many Rubik's cubes in a pool of threads
+
+goal: returns the entries of the state restored by a partial resolution
+
+chars_to_move: returns the move object of a list of chars
+
+compile: returns the cached kernel of a list of chars
+
+load_macros: loads a library of macros
+
 Notes
 -----
 
@@ -21,6 +34,7 @@ Created on Thu Dec 11 22:22:17 2014
 @author: Gilles Aouizerate
 """
 
+import os
 import numpy as np
 import random as rd
 
@@ -47,24 +61,29 @@ D = utl.move(P8 = [0,4,5,1], P12 = [0,4,8,5], P3 = [0,0,0,0], P2 = [0,0,0,0],
              seq = ["D"])
 d = D**(-1)
 
-fund = {}
-fund['F'] = F
-fund['f'] = f
-fund['R'] = R
-fund['r'] = r
-fund['U'] = U
-fund['u'] = u
-fund['B'] = B
-fund['b'] = b
-fund['L'] = L
-fund['l'] = l
-fund['D'] = D 
-fund['d'] = d
-
-
-# enlarged list of fundamental moves
-fund_l = [F, F**2, f, R, R**2, r, U, U**2, u, B, B**2, b, L, L**2, l, D,
-          D**2, d]
+# fundamental moves by their names, built once and never modified since they
+# are shared by all the searches, possibly running in several threads: their
+# matrices are read only
+fund = dict((m.decompo[0], m) for m in (F, f, R, r, U, u, B, b, L, l, D, d))
+for m in fund.values():
+    for a in (m.A8, m.S3, m.A12, m.S2):
+        a.setflags(write = False)
+del m, a
+
+
+# gathers of the fundamental moves, and kernels of the sequences compiled so
+# far by their strings, the cache being emptied beyond cache_size kernels
+fund_index = dict((a, fund[a].to_index()) for a in fund)
+kernels = {}
+cache_size = 4096
+
+solved = np.transpose(np.matrix(np.array(range(8) + range(12) + 8*range(3) +
+                                         12*range(2), dtype = float)))
+
+# enlarged list of fundamental moves, a tuple since it is shared by all the 
+# searches, possibly running in several threads
+fund_l = (F, F**2, f, R, R**2, r, U, U**2, u, B, B**2, b, L, L**2, l, D,
+          D**2, d)
 
 # moves that have special useful behaviors    
     
@@ -77,9 +96,75 @@ M23 = B**2*D*u*R**2*d*U
 M30 = l*R*F*l*R*D*l*R*B*B*r*L*D*r*L*F*r*L*U*U 
 M31 = b*F*D*b*F*R*b*F*U*U*f*B*R*f*B*D*f*B*L*L 
 
+# names of the macros above, the only ones a library may replace
+macro_names = ("M0", "M1", "M20", "M21", "M22", "M23", "M30", "M31")
+
+# library of shorter macros found by macros.py, loaded instead of the ones
+# above when it exists
+macro_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+                          "macros.txt")
+
 # useful functions
 
 
+def goal(corners = range(8), edges = range(12), orientations = True):
+    """Returns the sorted list of the entries of the 68x1 state that a partial
+    resolution must restore, to be given to solve or solve_iter.
+    
+    Parameters
+    ----------
+    
+    corners: (optional) list of int, corner cubicles to restore
+    
+    edges: (optional) list of int, edge cubicles to restore
+    
+    orientations: (optional) bool, if False only the positions of the cubies
+    are restored
+    
+    """
+    res = list(corners) + [8 + i for i in edges]
+    if orientations:
+        for i in corners:
+            res = res + range(20 + 3*i, 23 + 3*i)
+        for i in edges:
+            res = res + range(44 + 2*i, 46 + 2*i)
+    return sorted(res)
+
+
+# usual partial goals: the cross and the first layer on the D face, and the 
+# corners only
+cross = goal(corners = [], edges = [0, 4, 5, 8])
+first_layer = goal(corners = [0, 1, 4, 5], edges = [0, 4, 5, 8])
+all_corners = goal(edges = [])
+
+
+def compile(actions):
+    """Returns the kernel of the move corresponding to a list of chars (or a 
+    string), each of them being the name of a fundamental move. The kernels 
+    are cached by their strings, so that a sequence is only compiled once.
+    
+    Parameters
+    ----------
+    
+    actions: char list, corresponding to a list of names of consecutive 
+    fundamental moves
+    
+    """
+    key = "".join(actions)
+    # another thread may empty the cache at any time, hence the kernel is 
+    # never read back from it
+    res = kernels.get(key)
+    if res is None:
+        if len(kernels) >= cache_size:
+            kernels.clear()
+        index = np.arange(68)
+        for a in key:
+            index = index[fund_index[a]]
+        res = utl.kernel(index, key)
+        kernels[key] = res
+    return res
+
+
 def move_list_to_state(actions):
     """Returns the state of the Rubik's cube from a list a chars corresponding
     to a list consecutive fundamental moves.
@@ -91,23 +176,149 @@ def move_list_to_state(actions):
     fundamental moves
     
     """
-    M = utl.move(seq = [])
+    return compile(actions).apply(solved)
+
 
+def chars_to_move(actions):
+    """Returns the move object corresponding to a list of chars, each of them 
+    being the name of a fundamental move.
+    
+    Parameters
+    ----------
+    
+    actions: char list, corresponding to a list of names of consecutive 
+    fundamental moves
+    
+    """
+    res = utl.move(seq = [])
     for a in actions:
-        M = fund[a]*M
+        res = fund[a]*res
+    return res
+
+
+def load_macros(name = macro_file):
+    """Returns the dict from the names of the macros of a library file to 
+    their move objects. The file has one macro per line, its name followed by
+    its list of chars (e.g. "M20 BfLLbFUU"), the lines starting with # being
+    ignored. Raises a ValueError if a name is not one of macro_names.
     
-    X = range(8)+range(12)
-    for i in range(8):
-        X = X + range(3)
-    for i in range(12):
-        X = X + range(2)  
-    X = np.transpose(np.matrix(np.array(X)))
-    res = M.M*X    
+    Parameters
+    ----------
     
+    name: (optional) str, name of the library file
+    
+    """
+    res = {}
+    with open(name) as f:
+        for line in f:
+            if line.strip() == "" or line.startswith("#"):
+                continue
+            macro, actions = line.split()
+            if macro not in macro_names:
+                raise ValueError("unknown macro {0} in {1}".format(macro, 
+                                                                    name))
+            res[macro] = chars_to_move(list(actions))
     return res
 
 
-def solve(state):
+if os.path.exists(macro_file):
+    for macro, m in load_macros().items():
+        globals()[macro] = m
+
+
+def _buffer(cubicles, n):
+    """Returns the cubicle on which the orientation of the cubicle 0 is 
+    compensated when it is to be restored, the first one not to restore, and
+    the list of the cubicles to restore, without the cubicle 0 when all of 
+    them are since its orientation then follows from the others."""
+    rest = [i for i in range(n) if i not in cubicles]
+    if not rest:
+        return 0, [i for i in cubicles if i != 0]
+    return rest[0], cubicles
+
+
+def solve_iter(state, macros = False, goal = None, cost = len):
+    """Solves the Rubik's cube from a given state, yielding the moves as soon
+    as they are found.
+    
+    Each of the four phases of the resolution (corner positions, corner 
+    orientations, edge positions and edge orientations) yields its list of
+    chars once it is complete, so that the moves can be executed before the 
+    whole resolution is over.
+    
+    Parameters
+    ----------
+    
+    state: array 68x1 matrix representing the state of the Rubik's cube to 
+    solve
+    
+    macros: (optional) bool, if True each conjugated macro is yielded as soon 
+    as it is found instead of waiting for the end of its phase
+    
+    goal: (optional) list of int, entries of the state to restore, as 
+    returned by the goal function, the whole cube by default. The phases 
+    with nothing to restore are skipped, the others only bring back the 
+    cubies of the goal.
+    
+    cost: (optional) function returning the cost of a list of chars, the 
+    number of moves by default (see robot.cost_model). In every phase, each
+    search uses the cheapest of the conjugated macros found with the fewest
+    moves, costed after the moves already found. The choice is made one 
+    macro at a time, so that the whole solution is not always cheaper.
+    
+    """
+    Y = np.matrix(np.copy(state))
+    if goal is None:
+        goal = range(68)
+    goal = set(goal)
+
+    corner_pos = [i for i in range(8) if i in goal]
+    corner_ori = [i for i in range(8) if goal & set(range(20 + 3*i, 
+                                                          23 + 3*i))]
+    edge_pos = [i for i in range(12) if 8 + i in goal]
+    edge_ori = [i for i in range(12) if goal & set(range(44 + 2*i, 
+                                                         46 + 2*i))]
+    # the last two edges are brought back by the parity of the permutation,
+    # which is the one of the corners once they are all in place
+    if len(edge_pos) > 10:
+        corner_pos = range(8)
+        edge_pos = range(10)
+    corner_buffer, corner_ori = _buffer(corner_ori, 8)
+    edge_buffer, edge_ori = _buffer(edge_ori, 12)
+    # a macro is costed after the moves already found, so that the turns 
+    # merged across their boundary count
+    done = []
+    if cost is not len:
+        cost = lambda actions, cost = cost: cost(done + actions)
+
+    phases = [lambda Y: utl.iter_corner_pos(Y[:8], M0, 1, 3, fund_l, 
+                                            corner_pos, cost),
+              lambda Y: utl.iter_corner_cubies(Y[(8+12):(4*8+12)], M1, 2, 
+                                               fund_l, corner_ori,
+                                               corner_buffer, cost),
+              lambda Y: utl.iter_edge_pos(Y[8:(8+12)], [M20, M21, M22, M23], 
+                                          [[0, 3, 11], [5, 6, 7], [4, 6, 7], 
+                                           [2, 9, 10]], fund_l, edge_pos,
+                                          cost),
+              lambda Y: utl.iter_edge_cubies(Y[(4*8+12):], M31, 3, fund_l,
+                                             edge_ori, edge_buffer, cost)]
+    phases = [p for p, c in zip(phases, [corner_pos, corner_ori, edge_pos, 
+                                         edge_ori]) if c]
+
+    for phase in phases:
+        seq = []
+        for m in phase(Y):
+            Y = compile(m.decompo).apply(Y)
+            done.extend(m.decompo)
+            if macros:
+                yield m.decompo
+            else:
+                seq = seq + m.decompo
+        if not macros:
+            yield seq
+
+
+def solve(state, goal = None):
     """Solves the Rubk's cube from a given state.
     
     Parameters
@@ -116,29 +327,55 @@ def solve(state):
     state: array 68x1 matrix representing the state of the Rubik's cube to 
     solve
     
+    goal: (optional) list of int, entries of the state to restore, as 
+    returned by the goal function, the whole cube by default
+    
     """
+    res = []
+    for seq in solve_iter(state, goal = goal):
+        res = res + seq
+    
+    print "I solved the Rubik's cube in {0} moves!".format(len(res))
+    
+    return res
 
-    Y = np.matrix(np.copy(state))
 
-    Y1 = Y[:8]
+def _solve_quiet(args):
+    state, goal = args
+    res = []
+    for seq in solve_iter(state, goal = goal):
+        res = res + seq
+    return res
+
 
-    res1 = utl.solve_corner_pos(Y1, M0, 1, 3, fund_l)
-    Y = res1.M*Y
-    Y2 = Y[(8+12):(4*8+12)]
-    res2 = utl.pivot_corner_cubies(Y2, M1, 2, fund_l)
-    Y = res2.M*Y
-    Y3 = Y[8:(8+12)]
-    res3 = utl.solve_edge_pos(Y3, [M20, M21, M22, M23], [[0, 3, 11], [5, 6, 7], 
-                          [4, 6, 7], [2, 9, 10]], fund_l)
-    Y = res3.M*Y
-    Y4 = Y[(4*8+12):]
-    res4 = utl.pivot_edge_cubies(Y4, M31, 3, fund_l)
+def solve_many(states, threads = 1, goal = None):
+    """Solves many Rubik's cubes, in a pool of threads sharing the moves and
+    the macros of the solver. Returns the list of the solutions.
     
-    res = res4*res3*res2*res1    
+    Parameters
+    ----------
+    
+    states: list of 68x1 matrices, or Nx68 array, states of the Rubik's cubes
+    to solve
     
-    print "I solved the Rubik's cube in {0} moves!".format(len(res.decompo))
+    threads: (optional) int, number of threads
     
-    return res.decompo
+    goal: (optional) list of int, entries of the states to restore, as 
+    returned by the goal function, the whole cubes by default
+    
+    """
+    tasks = [(np.transpose(np.matrix(np.asarray(s, dtype = float).ravel())),
+              goal) for s in states]
+    if threads <= 1:
+        return [_solve_quiet(t) for t in tasks]
+    # imported here, the import of the solver being kept short
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(threads)
+    try:
+        return pool.map(_solve_quiet, tasks)
+    finally:
+        pool.close()
+        pool.join()
 
 
 def rand_move(num_move = 200):
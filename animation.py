@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Time based animation of the face turns of the Rubik's cube, independent of
+any rendering library.
+
+Classes
+-------
+
+scheduler: tells, from the clock, how far the face turn in progress should be
+
+cubies: positions and orientations of the 26 cubies of one or several 
+animated cubes
+
+functions
+---------
+
+cycles_to_index: returns the index array applying a permutation given by its
+cycles
+
+Examples
+--------
+
+>>> import time
+>>> import animation as anim
+>>> S = anim.scheduler(duration = 0.25)
+>>> S.begin(time.time())
+>>> angle, complete = S.step(time.time())
+>>> C = anim.cubies()
+>>> C.apply("F")
+
+"""
+
+import numpy as np
+
+import quaternion as quat
+
+# cubicles of each face of the cube, in the order in which the cubies are
+# indexed by the graphical representation
+A = range(9)
+B = range(17,26)
+C = [0, 1, 2, 9, 10, 11, 17, 18, 19]
+D = [6, 7, 8, 14, 15, 16, 23, 24, 25]
+E = [0, 3, 6, 9, 12, 14, 17, 20, 23]
+F = [2, 5, 8, 11, 13, 16, 19, 22, 25]
+
+
+def cycles_to_index(n, cycles):
+    """Returns the integer array index such that pos[index] is pos in which,
+    for each cycle c, the element in position c[k+1] is moved to position 
+    c[k]."""
+    index = np.arange(n)
+    for c in cycles:
+        index[c] = np.roll(c, -1)
+    return index
+
+
+# For each face: the key turning it by +90 degrees about one of the cubies 
+# axes, the key turning it back, the cubicles of the face, the axis and the
+# cycles of the cubicles
+faces = [("f", "F", A, 0, [[0, 6, 8, 2], [1, 3, 7, 5]]),
+         ("B", "b", B, 0, [[17, 23, 25, 19], [18, 20, 24, 22]]),
+         ("d", "D", C, 1, [[0, 2, 19, 17], [1, 11, 18, 9]]),
+         ("U", "u", D, 1, [[6, 8, 25, 23], [7, 16, 24, 14]]),
+         ("l", "L", E, 2, [[0, 17, 23, 6], [3, 9, 20, 14]]),
+         ("R", "r", F, 2, [[2, 19, 25, 8], [5, 11, 22, 16]])]
+
+# turns[key] gives the cubicles, axis and angle of the rotation as well as 
+# the index array updating pos for each of the 12 face turns
+turns = {}
+for direct, inverse, slots, axis, cycles in faces:
+    index = cycles_to_index(26, cycles)
+    turns[direct] = (np.array(slots), axis, 90., index)
+    turns[inverse] = (np.array(slots), axis, -90., np.argsort(index))
+
+
+class scheduler():
+    """A scheduler object interpolates the face turns over time rather than
+    over frames: each quarter turn lasts duration seconds divided by the
+    playback rate, whatever the frame rate and the load of the machine.
+
+    Consecutive turns are chained without any gap: when a turn ends between
+    two frames, the next one starts from that instant and not from the next
+    frame. Several turns may thus be completed within a single frame at high
+    playback rates, in which case they should be applied as instant state
+    updates rather than animated.
+
+    Attributes
+    ----------
+
+    duration: float, duration of a quarter turn in seconds at rate 1
+
+    rate: float, playback rate multiplier
+
+    skipping: bool, if True every turn is completed as soon as it is stepped,
+    which is how the queued turns are jumped over
+
+    """
+
+    def __init__(self, duration = 0.25, rate = 1.):
+        """Initializes a scheduler object
+
+        Parameters
+        ----------
+
+        duration: (optional) float, duration of a quarter turn in seconds
+
+        rate: (optional) float, playback rate multiplier
+
+        """
+        self.duration = duration
+        self.rate = rate
+        self.skipping = False
+        self.start = None
+        self.end = None
+        self.applied = 0.
+
+
+    def turn_time(self):
+        """Returns the actual duration of a quarter turn in seconds."""
+        return self.duration/self.rate
+
+
+    def in_progress(self):
+        """Returns True if a turn has begun and is not finished yet."""
+        return self.start is not None
+
+
+    def begin(self, now):
+        """Starts a new turn at time now, or at the end of the previous one if
+        it happened less than a turn ago."""
+        if self.end is not None and now - self.end < self.turn_time():
+            self.start = self.end
+        else:
+            self.start = now
+        self.applied = 0.
+
+
+    def step(self, now):
+        """Returns the angle in degrees by which the turn in progress has to
+        be advanced to be where it should be at time now, and whether it is
+        then complete."""
+        if self.skipping:
+            progress = 1.
+        else:
+            progress = min(1., (now - self.start)/self.turn_time())
+        angle = 90.*progress - self.applied
+        self.applied = 90.*progress
+        if progress == 1.:
+            self.end = min(self.start + self.turn_time(), now)
+            self.start = None
+        return angle, progress == 1.
+
+
+    def set_rate(self, rate, now):
+        """Changes the playback rate without any jump in the turn in
+        progress."""
+        if self.start is not None:
+            progress = (now - self.start)/self.turn_time()
+            self.rate = rate
+            self.start = now - progress*self.turn_time()
+        else:
+            self.rate = rate
+
+
+class cubies():
+    """A cubies object holds the state of the 26 cubies of each of n animated
+    cubes, stored in contiguous arrays: the cubie i of the cube k has index 
+    26*k+i.
+
+    Attributes
+    ----------
+
+    n: int, number of cubes
+
+    quater: QuaternionArray of the rotations of the 26*n cubies
+
+    axes: 3x(26*n)x3 array, for each cubie the vectors about which it rotates
+    when its x, y and z faces turn
+
+    rot: 3x(26*n) array, angles in degrees by which each cubie has been 
+    rotated about each of its axes
+
+    target: 3x(26*n) array, angles in degrees that each cubie has to reach 
+    about each of its axes at the end of the turn in progress
+
+    pos: nx26 array of integers, pos[k, i] is the index of the cubie which is
+    in cubicle i of the cube k
+
+    """
+
+    def __init__(self, n = 1):
+        """Initializes a cubies object with n cubes in the solved state."""
+        self.n = n
+        self.quater = quat.QuaternionArray.identity(26*n)
+        self.axes = np.zeros((3, 26*n, 3))
+        for a in range(3):
+            self.axes[a, :, a] = 1.
+        self.rot = np.zeros((3, 26*n))
+        self.target = np.zeros((3, 26*n))
+        self.pos = np.tile(np.arange(26), (n, 1))
+
+
+    def idle(self, k = None):
+        """Returns True if no turn is in progress, on the cube k or on any of
+        them if k is None."""
+        if k is None:
+            return (self.rot == self.target).all()
+        cube = slice(26*k, 26*(k+1))
+        return (self.rot[:, cube] == self.target[:, cube]).all()
+
+
+    def make_a_move(self, key, k = 0):
+        """Sets the targets of the cubies of the face of the cube k turned by 
+        key. This will start the moving process if no other turn is in 
+        progress on this cube."""
+        if key in turns and self.idle(k):
+            slots, axis, angle, index = turns[key]
+            cubies = 26*k + self.pos[k, slots]
+            self.target[axis, cubies] = self.target[axis, cubies] + angle
+            self.pos[k] = self.pos[k, index]
+
+
+    def make_moves(self, keys):
+        """Starts on each cube k the turn of keys[k], or none if it is 
+        None."""
+        for k, key in enumerate(keys):
+            if key is not None:
+                self.make_a_move(key, k)
+
+
+    def rotate(self, moving, a, angle):
+        """Rotates the cubies which indices are in the moving array by angle 
+        degrees about their axis a, updating their quaternions and their 
+        other axes accordingly."""
+        step = quat.QuaternionArray.from_axis_angle(self.axes[a, moving], 
+                                                    angle)
+        self.quater[moving] = (step*self.quater[moving]).normalize()
+        for b in range(3):
+            if b != a:
+                self.axes[b, moving] = step.rotate(self.axes[b, moving])
+
+
+    def advance(self, angle):
+        """Rotates all the cubies that have not yet reached their target 
+        angles by angle degrees towards them, without overshooting."""
+        for a in range(3):
+            moving = np.nonzero(self.rot[a] != self.target[a])[0]
+            if len(moving) > 0:
+                remaining = self.target[a, moving] - self.rot[a, moving]
+                step = np.sign(remaining)*np.minimum(np.abs(remaining), angle)
+                self.rot[a, moving] = np.where(np.abs(remaining) <= angle, 
+                                               self.target[a, moving],
+                                               self.rot[a, moving] + step)
+                self.rotate(moving, a, step)
+
+
+    def apply(self, key, k = 0):
+        """Applies instantly the turn of key to the cube k, once the turn in 
+        progress, if any, is over."""
+        self.advance(90.)
+        self.make_a_move(key, k)
+        self.advance(90.)
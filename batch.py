@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized operations on large batches of Rubik's cube states.
+
+A batch of states is a Nx68 array of uint8 with the same layout as the 68x1
+matrices returned by Kube.move_list_to_state. A batch of move sequences is a
+NxL array of uint8 move codes, the code of a fundamental move being its index
+in the codes string. Shorter sequences are padded with the pad code.
+
+functions
+---------
+
+encode: returns the array of the codes of a list of chars
+
+decode: returns the list of chars of an array of codes
+
+solved_states: returns a batch of states of the solved cube
+
+parity: returns the parities of a batch of permutations
+
+random_states: returns a batch of uniformly random legal states
+
+apply_codes: applies a batch of move sequences to a batch of states
+
+pack: returns the codes and offsets of a list of move sequences
+
+unpack: returns the padded array of codes of packed move sequences
+
+verify: checks that a batch of solutions solve a batch of states
+
+Examples
+--------
+
+>>> import batch
+>>> states = batch.random_states(1000000, seed = 0)
+>>> seqs = batch.encode([["F", "R", "u"], ["L", "d"]])
+>>> states = batch.apply_codes(batch.solved_states(2), seqs)
+>>> codes, offsets = batch.pack([["U", "r", "f"], ["D", "l"]])
+>>> ok, first = batch.verify(states, codes, offsets)
+
+"""
+
+import numpy as np
+
+import Kube as kb
+
+# names of the fundamental moves, in the order of their codes
+codes = "FfRrUuBbLlDd"
+
+# code of the padding of the sequences shorter than the others
+pad = 255
+
+# index[c] is the gather applying the fundamental move of code c to a state,
+# the extra last row is the identity applied by the padding
+index = np.array([kb.fund_index[a] for a in codes] + [range(68)])
+
+# lookup table from the codes to the rows of index, the codes which are
+# neither a fundamental move nor the padding mapping to unknown
+unknown = len(index)
+rows = np.empty(256, dtype = np.uint8)
+rows[:] = unknown
+rows[:len(codes)] = range(len(codes))
+rows[pad] = len(codes)
+
+solved = np.array(range(8) + range(12) + 8*range(3) + 12*range(2),
+                  dtype = np.uint8)
+
+
+def encode(actions):
+    """Returns the array of uint8 codes of a list of chars, or the padded Nx L
+    array of codes of a list of N lists of chars.
+
+    Parameters
+    ----------
+
+    actions: char list, or list of char lists, names of fundamental moves
+
+    """
+    if len(actions) > 0 and not isinstance(actions[0], str):
+        length = max([len(a) for a in actions])
+        res = np.empty((len(actions), length), dtype = np.uint8)
+        res[:] = pad
+        for i, a in enumerate(actions):
+            res[i, :len(a)] = encode(a)
+        return res
+    return np.array([codes.index(a) for a in actions], dtype = np.uint8)
+
+
+def decode(seq):
+    """Returns the list of the names of the fundamental moves of an array of
+    codes, the padding being dropped."""
+    return [codes[c] for c in seq if c != pad]
+
+
+def solved_states(n):
+    """Returns the nx68 array of the states of n solved cubes."""
+    return np.tile(solved, (n, 1))
+
+
+def parity(perms):
+    """Returns the array of the parities (0 for even, 1 for odd) of the
+    permutations which are the rows of perms."""
+    res = np.zeros(len(perms), dtype = np.uint8)
+    k = perms.shape[1]
+    for i in range(k):
+        for j in range(i+1, k):
+            res ^= perms[:, i] > perms[:, j]
+    return res
+
+
+def random_states(n, seed = None):
+    """Returns a nx68 array of uint8 of states uniformly drawn among all the
+    legal states of the cube.
+
+    The positions of the corners and of the edges are uniformly random
+    permutations of the same parity, the orientations are uniformly random
+    with the sum of the corner twists a multiple of 3 and the sum of the edge
+    flips a multiple of 2. No move is ever applied.
+
+    Parameters
+    ----------
+
+    n: int, number of states
+
+    seed: (optional) int, seed of the random generator
+
+    """
+    rs = np.random.RandomState(seed)
+    cp = np.argsort(rs.rand(n, 8), axis = 1).astype(np.uint8)
+    ep = np.argsort(rs.rand(n, 12), axis = 1).astype(np.uint8)
+    # swapping two edges is a bijection between the even and the odd
+    # permutations, hence the edge permutations remain uniform
+    odd = parity(cp) != parity(ep)
+    ep[odd, 10], ep[odd, 11] = ep[odd, 11], ep[odd, 10]
+
+    twist = rs.randint(0, 3, (n, 8))
+    twist[:, 7] = (-twist[:, :7].sum(axis = 1)) % 3
+    flip = rs.randint(0, 2, (n, 12))
+    flip[:, 11] = flip[:, :11].sum(axis = 1) % 2
+
+    res = np.empty((n, 68), dtype = np.uint8)
+    res[:, :8] = cp
+    res[:, 8:20] = ep
+    res[:, 20:44] = ((twist[:, :, np.newaxis] + np.arange(3)) % 3).reshape(
+        (n, 24))
+    res[:, 44:] = np.concatenate([flip[:, :, np.newaxis],
+                                  1 - flip[:, :, np.newaxis]],
+                                 axis = 2).reshape((n, 24))
+    return res
+
+
+def apply_codes(states, seqs):
+    """Returns the states obtained by applying to each state the moves of the
+    corresponding sequence.
+
+    At each step, the states are grouped by the code of their next move so
+    that each group is transformed by a single gather.
+
+    Parameters
+    ----------
+
+    states: Nx68 array, states of the cubes
+
+    seqs: NxL array of uint8, codes of the moves of the sequences, or array
+    of L codes applied to all the states
+
+    Raises a ValueError if a code is neither the one of a fundamental move
+    nor the pad code.
+
+    """
+    states = np.asarray(states)
+    seqs = np.asarray(seqs, dtype = np.uint8)
+    if np.any(rows[seqs] == unknown):
+        raise ValueError("unknown move code in the sequences")
+    if seqs.ndim == 1:
+        for c in seqs:
+            states = np.take(states, index[rows[c]], axis = 1)
+        return states
+    for t in range(seqs.shape[1]):
+        step = rows[seqs[:, t]]
+        res = np.empty_like(states)
+        for k in range(len(index)):
+            sel = np.nonzero(step == k)[0]
+            if len(sel) > 0:
+                res[sel] = np.take(states.take(sel, axis = 0), index[k],
+                                   axis = 1)
+        states = res
+    return states
+
+
+def pack(actions):
+    """Returns the packed form of a list of N lists of chars: the 1-D array of
+    uint8 codes of all the moves, one sequence after the other, and the array
+    of the N+1 offsets such that the codes of the sequence i are
+    codes[offsets[i]:offsets[i+1]]."""
+    offsets = np.zeros(len(actions) + 1, dtype = np.int64)
+    offsets[1:] = np.cumsum([len(a) for a in actions])
+    res = np.empty(offsets[-1], dtype = np.uint8)
+    for i, a in enumerate(actions):
+        res[offsets[i]:offsets[i+1]] = encode(a)
+    return res, offsets
+
+
+def unpack(codes, offsets):
+    """Returns the NxL array of the codes of packed sequences, the sequences
+    shorter than the longest one being padded with the pad code.
+
+    Parameters
+    ----------
+
+    codes: array of uint8, codes of all the moves, one sequence after the
+    other
+
+    offsets: array of N+1 int, bounds of the sequences in codes
+
+    """
+    codes = np.asarray(codes, dtype = np.uint8)
+    offsets = np.asarray(offsets, dtype = np.int64)
+    lengths = offsets[1:] - offsets[:-1]
+    steps = np.arange(lengths.max() if len(lengths) > 0 else 0)
+    inside = steps < lengths[:, np.newaxis]
+    res = np.empty(inside.shape, dtype = np.uint8)
+    res[:] = pad
+    res[inside] = codes[(offsets[:-1, np.newaxis] + steps)[inside]]
+    return res
+
+
+def verify(states, codes, offsets):
+    """Applies to each state the moves of the corresponding packed solution,
+    all the states being moved at once step by step, and checks that the
+    cubes end up solved.
+
+    Parameters
+    ----------
+
+    states: Nx68 array, states of the scrambled cubes
+
+    codes: array of uint8, codes of all the moves of the solutions, one
+    solution after the other
+
+    offsets: array of N+1 int, bounds of the solutions in codes
+
+    Returns
+    -------
+
+    ok: array of N bool, True where the solution solves the cube, False
+    where it holds a code which is neither the one of a fundamental move nor
+    the pad code
+
+    first: int, index of the first solution which fails, -1 if none does
+
+    """
+    states = np.asarray(states)
+    if len(offsets) != len(states) + 1:
+        raise ValueError("{0} offsets for {1} states".format(len(offsets),
+                                                            len(states)))
+    seqs = unpack(codes, offsets)
+    known = np.all(rows[seqs] != unknown, axis = 1)
+    seqs[~known] = pad
+    res = apply_codes(states, seqs)
+    ok = np.all(res == solved, axis = 1) & known
+    failed = np.nonzero(~ok)[0]
+    first = failed[0] if len(failed) > 0 else -1
+    return ok, first
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the Rubik's cube solver.
+
+functions
+---------
+
+import_time: measures the time needed to import a module in a fresh
+interpreter
+
+bench_import: checks the import time of the headless solver core
+
+bench_verify: measures the throughput of the bulk solution verifier
+
+bench_nxn: measures how the NxN cube model and solver scale with N
+
+bench_resume: checks that a corpus job killed while writing resumes
+
+Usage
+-----
+
+Run all the benchmarks, the exit status is non zero if one of them is over
+its budget::
+
+$ python bench.py
+
+and measure the scaling of the NxN cubes with N::
+
+$ python bench.py --nxn 2 3 4 5 6 7
+
+and check that a job solving a corpus resumes after being killed::
+
+$ python bench.py --resume
+
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+# budget, in seconds, of the import of the headless solver core
+import_budget = 0.2
+
+# modules that the headless solver core must not pull in
+heavy_modules = ["scipy", "OpenGL"]
+
+# minimal throughput, in moves per second, of the bulk solution verifier
+verify_budget = 1e6
+
+
+def import_time(module, repeat = 5):
+    """Returns the shortest time, over repeat fresh interpreters, needed to
+    import module, and the list of the heavy modules it pulled in.
+
+    Parameters
+    ----------
+
+    module: str, name of the module
+
+    repeat: (optional) int, number of measures
+
+    """
+    code = ("import sys, time\n"
+            "t = time.time()\n"
+            "import {0}\n"
+            "t = time.time() - t\n"
+            "heavy = [m for m in {1!r} if m in sys.modules]\n"
+            "print(repr((t, heavy)))\n").format(module, heavy_modules)
+    best = None
+    for i in range(repeat):
+        out = subprocess.check_output([sys.executable, "-c", code], 
+                                      cwd = os.path.dirname(
+                                          os.path.abspath(__file__)))
+        t, heavy = eval(out.strip())
+        if best is None or t < best:
+            best = t
+    return best, heavy
+
+
+def bench_import():
+    """Checks that the headless solver core is imported within its budget and
+    without any heavy dependency. Returns True if it is the case."""
+    t, heavy = import_time("Kube")
+    print "import Kube: {0:.1f} ms (budget {1:.0f} ms)".format(1000.*t,
+        1000.*import_budget)
+    if heavy:
+        print "import Kube pulls in {0}".format(", ".join(heavy))
+    return t <= import_budget and not heavy
+
+
+def bench_verify(n = 100000, length = 40, seed = 0):
+    """Checks that the bulk verifier applies at least verify_budget moves per
+    second, on n random scrambles of the given length followed by their
+    inverses. Returns True if it is the case."""
+    import numpy as np
+    import batch
+    rs = np.random.RandomState(seed)
+    seqs = rs.randint(0, len(batch.codes), (n, length)).astype(np.uint8)
+    states = batch.apply_codes(batch.solved_states(n), seqs)
+    # the inverse of a fundamental move is the next or previous code
+    inverse = (seqs[:, ::-1] ^ 1).ravel()
+    offsets = np.arange(n + 1)*length
+    t = time.time()
+    ok, first = batch.verify(states, inverse, offsets)
+    t = time.time() - t
+    rate = n*length/t
+    print "verify: {0:.2f} M moves/s (budget {1:.2f} M moves/s)".format(
+        rate/1e6, verify_budget/1e6)
+    if first >= 0:
+        print "verify: solution {0} fails".format(first)
+    return rate >= verify_budget and ok.all()
+
+
+def bench_nxn(sizes, batch_size = 1000, length = 100, seed = 0):
+    """Prints, for each size N of cube, the time needed to build the tables of
+    its moves, the number of moves applied per second to a batch of states,
+    and the time and the length of the resolution of a random scramble.
+    Returns True if all the scrambles are solved."""
+    import numpy as np
+    import nxn
+    random.seed(seed)
+    res = True
+    print "   N stickers   tables   M moves/s     solve    moves"
+    for n in sizes:
+        t = time.time()
+        nxn.move_tables(n)
+        nxn.orbits(n)
+        tables = time.time() - t
+        states = np.tile(nxn.solved_state(n), (batch_size, 1))
+        actions = nxn.rand_move(n, length)
+        t = time.time()
+        nxn.apply(states, actions, n)
+        rate = batch_size*length/(time.time() - t)
+        state = nxn.apply(nxn.solved_state(n), nxn.rand_move(n, 20*n), n)
+        t = time.time()
+        solution = nxn.solve(state, n)
+        solve = time.time() - t
+        ok = (nxn.apply(state, solution, n) == nxn.solved_state(n)).all()
+        res = res and ok
+        print "{0:4d} {1:8d} {2:6.3f} s {3:11.2f} {4:7.2f} s {5:8d}{6}".format(
+            n, 6*n*n, tables, rate/1e6, solve, len(solution),
+            "" if ok else " not solved")
+    return res
+
+
+def bench_resume(n = 12, shard = 4, kill = 6, seed = 0):
+    """Checks that a job solving a corpus of n scrambles by shards, killed
+    in a fresh interpreter while writing its solution number kill + 1,
+    resumes after its last checkpoint and ends with solutions solving all
+    the scrambles. Returns True if it is the case."""
+    import batch
+    import corpus
+    import jobs
+    import Kube as kb
+    random.seed(seed)
+    tmp = tempfile.mkdtemp()
+    try:
+        scrambles = os.path.join(tmp, "scrambles.seq")
+        solutions = os.path.join(tmp, "solutions.seq")
+        corpus.save(scrambles, [kb.rand_move(20) for i in range(n)])
+        # the process exits, without any cleanup but with the codes written
+        # so far on the disk, instead of writing the solution number kill + 1
+        code = ("import os, corpus, jobs\n"
+                "write = corpus.writer.write\n"
+                "count = [0]\n"
+                "def killed(self, actions):\n"
+                "    count[0] += 1\n"
+                "    if count[0] > {0}:\n"
+                "        self.f.flush()\n"
+                "        os._exit(1)\n"
+                "    write(self, actions)\n"
+                "corpus.writer.write = killed\n"
+                "jobs.solve_corpus({1!r}, {2!r}, {3}, verbose = False)\n"
+                ).format(kill, scrambles, solutions, shard)
+        subprocess.call([sys.executable, "-c", code],
+                        cwd = os.path.dirname(os.path.abspath(__file__)))
+        done = jobs.load_checkpoint(solutions + ".ckpt")["done"]
+        t = time.time()
+        solved = jobs.solve_corpus(scrambles, solutions, shard,
+                                   verbose = False)
+        t = time.time() - t
+        codes, offsets = corpus.reader(solutions).packed()
+        states = jobs._states(corpus.reader(scrambles), 0, n)
+        ok, first = batch.verify(states, codes, offsets)
+        print "resume: killed after {0} solutions, resumed after {1}, " \
+            "{2} solved again in {3:.1f} s".format(kill, done, solved, t)
+        if first >= 0:
+            print "resume: solution {0} fails".format(first)
+        return (done == kill//shard*shard and solved == n - done and
+                len(offsets) == n + 1 and ok.all())
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Benchmarks of the "
+                                     "Rubik's cube solver.")
+    parser.add_argument("--nxn", type = int, nargs = "+", help = "sizes of "
+                        "the NxN cubes to benchmark instead of the budgets")
+    parser.add_argument("--resume", action = "store_true", help = "check "
+                        "that a corpus job killed while writing resumes")
+    args = parser.parse_args()
+    if args.nxn is not None:
+        sys.exit(0 if bench_nxn(args.nxn) else 1)
+    if args.resume:
+        sys.exit(0 if bench_resume() else 1)
+    ok = bench_import()
+    ok = bench_verify() and ok
+    sys.exit(0 if ok else 1)
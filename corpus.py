@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Compact binary files of move sequences, such as scrambles or solutions.
+
+Description
+-----------
+
+A corpus file holds a list of sequences of fundamental moves, stored as the
+codes of the batch module (batch.codes) packed two per byte, the first code
+in the high 4 bits. It is made of:
+
+* a header of 64 bytes: the magic string, the version, the number of bits of
+  a code and the names of the moves in the order of their codes
+
+* the payload: all the codes, one sequence after the other
+
+The sequences are found through an index file, of the same name followed by
+'.idx', made of:
+
+* a header of 24 bytes: the magic string, the number of sequences N and the
+  total number of codes
+
+* the N+1 offsets (int64) of the sequences in the payload, in codes
+
+The payload is read through a memory map, so that any sequence is read
+without loading the others. A writer only appends codes to the payload and
+commits them at each flush by atomically replacing the index file (a
+temporary file being renamed), so that a writer stopped at any time leaves
+the sequences of its last flush, the codes written after it being ignored.
+
+Classes
+-------
+
+writer: appends sequences to a corpus file
+
+reader: reads the sequences of a corpus file
+
+functions
+---------
+
+save: writes a list of sequences to a corpus file
+
+load: returns the list of the sequences of a corpus file
+
+Examples
+--------
+
+>>> import corpus
+>>> import Kube as kb
+>>> corpus.save("scrambles.seq", [kb.rand_move(20) for i in range(1000)])
+>>> with corpus.writer("scrambles.seq", append = True) as w:
+...     w.write(kb.rand_move(20))
+>>> r = corpus.reader("scrambles.seq")
+>>> len(r), r[1000]
+>>> codes, offsets = r.packed()
+
+"""
+
+import os
+import struct
+
+import numpy as np
+
+import batch
+
+magic = b"RUBIKSEQ"
+index_magic = b"RUBIKIDX"
+version = 2
+bits = 4
+
+# magic, version, bits, names of the moves, padded to 64 bytes
+header = struct.Struct("<8sHH12s")
+header_size = 64
+
+# magic, number of sequences, number of codes
+index_header = struct.Struct("<8sqq")
+
+
+def index_name(name):
+    """Returns the name of the index file of the corpus file name."""
+    return name + '.idx'
+
+
+def _commit(name, offsets):
+    """Atomically replaces the index file of the corpus file name by the one
+    of a list of offsets."""
+    tmp = index_name(name) + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(index_header.pack(index_magic, len(offsets) - 1,
+                                  offsets[-1]))
+        f.write(np.array(offsets, dtype = np.int64).tostring())
+        f.flush()
+        os.fsync(f.fileno())
+    if os.name == 'nt' and os.path.exists(index_name(name)):
+        os.remove(index_name(name))
+    os.rename(tmp, index_name(name))
+
+
+def _unpack(data, start, stop):
+    """Returns the codes start to stop of a payload of packed codes."""
+    data = np.asarray(data[start//2:(stop + 1)//2])
+    res = np.empty(2*len(data), dtype = np.uint8)
+    res[0::2] = data >> 4
+    res[1::2] = data & 15
+    return res[start % 2:start % 2 + stop - start]
+
+
+class reader():
+    """Reads the sequences of a corpus file through a memory map. Raises a
+    ValueError if the file or its index is not valid.
+
+    Attributes
+    ----------
+
+    offsets: array of N+1 int64, offsets of the sequences in the payload
+
+    payload: array of uint8, packed codes of all the sequences
+
+    """
+    def __init__(self, name):
+        data = np.memmap(name, dtype = np.uint8, mode = 'r')
+        if len(data) < header_size:
+            raise ValueError("{0} is not a corpus file".format(name))
+        fields = header.unpack(data[:header.size].tostring())
+        if fields[0] != magic or fields[1] != version or fields[2] != bits:
+            raise ValueError("{0} is not a corpus file of version "
+                             "{1}".format(name, version))
+        if fields[3] != batch.codes.encode('ascii'):
+            raise ValueError("{0} uses unknown move codes".format(name))
+        with open(index_name(name), 'rb') as f:
+            fields = index_header.unpack(f.read(index_header.size))
+            offsets = np.fromfile(f, dtype = np.int64)
+        n, n_codes = fields[1], fields[2]
+        if (fields[0] != index_magic or len(offsets) != n + 1 or
+            offsets[0] != 0 or offsets[-1] != n_codes or
+            np.any(np.diff(offsets) < 0)):
+            raise ValueError("{0} is not a valid index of {1}".format(
+                index_name(name), name))
+        if header_size + (n_codes + 1)//2 > len(data):
+            raise ValueError("{0} is shorter than its index".format(name))
+        self.payload = data[header_size:header_size + (n_codes + 1)//2]
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def codes(self, i):
+        """Returns the array of the codes of the sequence i."""
+        return _unpack(self.payload, self.offsets[i], self.offsets[i+1])
+
+    def __getitem__(self, i):
+        return batch.decode(self.codes(i))
+
+    def packed(self, start = 0, stop = None):
+        """Returns the codes of the sequences start to stop, all of them by
+        default, and their offsets, as expected by batch.unpack and
+        batch.verify."""
+        if stop is None:
+            stop = len(self)
+        offsets = np.array(self.offsets[start:stop+1])
+        return (_unpack(self.payload, offsets[0], offsets[-1]),
+                offsets - offsets[0])
+
+
+class writer():
+    """Appends sequences to a corpus file, which is created if needed. The
+    sequences written are committed by each call to flush or close, and the
+    ones of the existing file which are not kept are dropped at once.
+
+    Parameters
+    ----------
+
+    name: str, name of the file
+
+    append: (optional) bool, if True the sequences are appended to the ones
+    of the existing file instead of replacing them
+
+    keep: (optional) int, number of sequences of the existing file kept when
+    appending, all of them by default
+
+    """
+    def __init__(self, name, append = False, keep = None):
+        self.name = name
+        self.offsets = [0]
+        self.pending = None
+        if append and os.path.exists(name):
+            r = reader(name)
+            if keep is None:
+                keep = len(r)
+            self.offsets = [int(o) for o in r.offsets[:keep+1]]
+            n_codes = self.offsets[-1]
+            if keep < len(r):
+                _commit(name, self.offsets)
+            # an odd number of codes leaves the last byte half filled
+            if n_codes % 2 == 1:
+                self.pending = int(r.payload[n_codes//2]) >> 4
+            del r
+            self.f = open(name, 'r+b')
+            self.f.seek(header_size + n_codes//2)
+        else:
+            # the old sequences are dropped before their payload is replaced
+            _commit(name, self.offsets)
+            self.f = open(name, 'w+b')
+            self.f.write(header.pack(magic, version, bits,
+                                     batch.codes.encode('ascii')))
+            self.f.write(b"\0"*(header_size - header.size))
+        self.flush()
+
+    def write(self, actions):
+        """Appends a sequence, a list of chars naming fundamental moves or
+        an array of their codes."""
+        if len(actions) > 0 and isinstance(actions[0], str):
+            codes = batch.encode(actions)
+        else:
+            codes = np.asarray(actions, dtype = np.uint8)
+        self.offsets.append(self.offsets[-1] + len(codes))
+        if self.pending is not None:
+            codes = np.concatenate([[self.pending], codes]).astype(np.uint8)
+            self.pending = None
+        if len(codes) % 2 == 1:
+            self.pending = int(codes[-1])
+            codes = codes[:-1]
+        self.f.write((codes[0::2] << 4 | codes[1::2]).tostring())
+
+    def write_many(self, sequences):
+        """Appends the sequences of a list."""
+        for actions in sequences:
+            self.write(actions)
+
+    def flush(self):
+        """Commits the sequences written so far: the payload is written to
+        the disk, then the index file is replaced."""
+        end = self.f.tell()
+        # the high 4 bits of a half filled byte are kept when it is completed
+        if self.pending is not None:
+            self.f.write(struct.pack("B", self.pending << 4))
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        _commit(self.name, self.offsets)
+        # the codes written after the last flush of a stopped writer
+        self.f.truncate()
+        self.f.seek(end)
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def save(name, sequences):
+    """Writes a list of sequences, lists of chars naming fundamental moves,
+    to the corpus file name."""
+    with writer(name) as w:
+        w.write_many(sequences)
+
+
+def load(name):
+    """Returns the list of the sequences, lists of chars naming fundamental
+    moves, of the corpus file name."""
+    codes, offsets = reader(name).packed()
+    return [batch.decode(codes[offsets[i]:offsets[i+1]])
+            for i in range(len(offsets) - 1)]
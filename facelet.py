@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Conversions between the standard 54 facelet format of the Rubik's cube and
+the 68 entries state used by Kube.solve.
+
+A facelet string lists the colours of the 9 stickers of the faces U, R, F,
+D, L and B, in this order, each face being read row by row as seen from the
+outside with its usual neighbour on top (B above U, U above R, F, L and B, F
+above D). The colours may be any 6 characters, the colour of a face being the
+one of its centre: the solved cube reads
+UUUUUUUUURRRRRRRRRFFFFFFFFFDDDDDDDDDLLLLLLLLLBBBBBBBBB.
+
+In bulk, facelets are held in Nx54 arrays of uint8, the face indices of the
+stickers, and states in Nx68 arrays of uint8, as in the batch module. All the
+conversions and checks are done by NumPy on the whole batch at once.
+
+functions
+---------
+
+from_strings: returns the Nx54 array of the facelets of a list of strings
+
+read_file: returns the Nx54 array of the facelets of a file of strings
+
+to_strings: returns the list of the strings of an array of facelets
+
+validate: checks which facelets represent legal cubes
+
+to_states: returns the Nx68 states of an array of facelets
+
+from_states: returns the Nx54 facelets of an array of states
+
+to_state: returns the 68x1 state of a facelet string, as used by Kube.solve
+
+to_string: returns the facelet string of a 68x1 state
+
+Examples
+--------
+
+>>> import facelet
+>>> import Kube as kb
+>>> s = facelet.to_string(kb.move_list_to_state(["F", "R"]))
+>>> actions = kb.solve(facelet.to_state(s))
+>>> states = facelet.to_states(facelet.read_file("scans.txt"))
+
+"""
+
+import numpy as np
+
+import batch
+
+faces = "URFDLB"
+
+# indices of the stickers of the corner cubicles, in the order of the
+# cubicles of the utilities.move objects, the first sticker being the one on
+# the U or D face and the others following clockwise
+corner_facelets = np.array([[27, 44, 24], [33, 53, 42], [6, 18, 38],
+                            [0, 36, 47], [29, 26, 15], [35, 17, 51],
+                            [8, 9, 20], [2, 45, 11]])
+
+# indices of the stickers of the edge cubicles, the first sticker being the
+# one on the U or D face, or on the F or B face for the middle layer
+edge_facelets = np.array([[30, 43], [21, 41], [50, 39], [3, 37], [28, 25],
+                          [34, 52], [7, 19], [1, 46], [32, 16], [23, 12],
+                          [48, 14], [5, 10]])
+
+centres = np.array([4, 13, 22, 31, 40, 49])
+
+# face indices of the stickers of the corner and edge cubies
+corner_colours = corner_facelets//9
+edge_colours = edge_facelets//9
+
+# from the code 36*c0 + 6*c1 + c2 of the colours seen in the cubicle of a
+# corner, to 3*cubie + twist, the twist being the position of the U or D
+# colour among the stickers, 255 if no cubie has these colours
+corner_lut = np.empty(216, dtype = np.uint8)
+corner_lut[:] = 255
+for c in range(8):
+    for o in range(3):
+        seen = corner_colours[c, (np.arange(3) - o) % 3]
+        corner_lut[36*seen[0] + 6*seen[1] + seen[2]] = 3*c + o
+
+# from the code 6*c0 + c1 of the colours seen in the cubicle of an edge, to
+# 2*cubie + flip, 255 if no cubie has these colours
+edge_lut = np.empty(36, dtype = np.uint8)
+edge_lut[:] = 255
+for e in range(12):
+    for o in range(2):
+        seen = edge_colours[e, (np.arange(2) + o) % 2]
+        edge_lut[6*seen[0] + seen[1]] = 2*e + o
+
+solved = np.repeat(np.arange(6, dtype = np.uint8), 9)
+
+
+def _faces_of(chars):
+    """Returns the face indices of a Nx54 array of uint8 characters, each
+    character being replaced by the index of the centre of the same colour,
+    or 255 if no centre has its colour."""
+    match = chars[:, :, np.newaxis] == chars[:, centres][:, np.newaxis, :]
+    res = np.argmax(match, axis = 2).astype(np.uint8)
+    res[~match.any(axis = 2)] = 255
+    # with two centres of the same colour the matching is ambiguous
+    same = np.zeros(len(chars), dtype = bool)
+    for i in range(6):
+        for j in range(i+1, 6):
+            same |= chars[:, centres[i]] == chars[:, centres[j]]
+    res[same] = 255
+    return res
+
+
+def from_strings(strings):
+    """Returns the Nx54 array of uint8 of the face indices of the stickers of
+    a list of N facelet strings. The stickers whose colour is not the one of
+    any centre, or the whole cube if two centres share a colour, are set to
+    255.
+
+    Parameters
+    ----------
+
+    strings: list of str, facelet strings of 54 characters
+
+    """
+    if len(strings) == 0:
+        return np.zeros((0, 54), dtype = np.uint8)
+    data = "".join(strings)
+    if len(data) != 54*len(strings):
+        raise ValueError("facelet strings must be 54 characters long")
+    chars = np.frombuffer(data.encode('ascii'), dtype = np.uint8)
+    return _faces_of(chars.reshape((len(strings), 54)))
+
+
+def read_file(name):
+    """Returns the Nx54 array of uint8 of the face indices of the stickers of
+    the facelet strings of a file, white spaces and line ends being ignored.
+
+    Parameters
+    ----------
+
+    name: str, name of the file
+
+    """
+    chars = np.fromfile(name, dtype = np.uint8)
+    chars = chars[~np.in1d(chars, np.frombuffer(b" \t\r\n",
+                                                  dtype = np.uint8))]
+    if len(chars) % 54 != 0:
+        raise ValueError("{0} does not hold a whole number of facelet "
+                         "strings".format(name))
+    return _faces_of(chars.reshape((-1, 54)))
+
+
+def to_strings(facelets, colours = faces):
+    """Returns the list of the facelet strings of a Nx54 array of face
+    indices.
+
+    Parameters
+    ----------
+
+    facelets: Nx54 array of face indices
+
+    colours: (optional) str, characters of the colours of the 6 faces
+
+    """
+    lut = np.frombuffer(colours.encode('ascii'), dtype = np.uint8)
+    chars = np.ascontiguousarray(lut[np.asarray(facelets)])
+    return [row.tostring() for row in chars]
+
+
+def _cubies(facelets):
+    """Returns the codes 3*cubie + twist (Nx8) and 2*cubie + flip (Nx12) of
+    the corners and edges seen in each cubicle, 255 where the colours match
+    no cubie."""
+    f = np.asarray(facelets, dtype = np.int64)
+    cc = np.minimum(f[:, corner_facelets], 5)
+    corners = corner_lut[36*cc[:, :, 0] + 6*cc[:, :, 1] + cc[:, :, 2]]
+    corners[(f[:, corner_facelets] > 5).any(axis = 2)] = 255
+    ec = np.minimum(f[:, edge_facelets], 5)
+    edges = edge_lut[6*ec[:, :, 0] + ec[:, :, 1]]
+    edges[(f[:, edge_facelets] > 5).any(axis = 2)] = 255
+    return corners, edges
+
+
+def validate(facelets):
+    """Checks which facelets represent a cube reachable from the solved one:
+    centres in place, 8 distinct corners and 12 distinct edges with existing
+    colours, total twist a multiple of 3, total flip a multiple of 2 and
+    permutations of the corners and edges of the same parity.
+
+    Parameters
+    ----------
+
+    facelets: Nx54 array of face indices
+
+    Returns
+    -------
+
+    ok: array of N bool, True for the legal cubes
+
+    first: int, index of the first illegal cube, -1 if there is none
+
+    """
+    facelets = np.asarray(facelets)
+    corners, edges = _cubies(facelets)
+    ok = np.all(facelets[:, centres] == np.arange(6), axis = 1)
+    ok &= np.all(corners != 255, axis = 1) & np.all(edges != 255, axis = 1)
+    cp, twist = corners//3, corners % 3
+    ep, flip = edges//2, edges % 2
+    ok &= np.all(np.sort(cp, axis = 1) == np.arange(8), axis = 1)
+    ok &= np.all(np.sort(ep, axis = 1) == np.arange(12), axis = 1)
+    ok &= twist.sum(axis = 1) % 3 == 0
+    ok &= flip.sum(axis = 1) % 2 == 0
+    ok &= batch.parity(cp) == batch.parity(ep)
+    failed = np.nonzero(~ok)[0]
+    first = failed[0] if len(failed) > 0 else -1
+    return ok, first
+
+
+def to_states(facelets, check = True):
+    """Returns the Nx68 array of uint8 of the states of the cubes represented
+    by a Nx54 array of face indices.
+
+    Parameters
+    ----------
+
+    facelets: Nx54 array of face indices
+
+    check: (optional) bool, if True a ValueError is raised when one of the
+    cubes is not legal
+
+    """
+    if check:
+        ok, first = validate(facelets)
+        if first >= 0:
+            raise ValueError("facelets {0} do not represent a legal "
+                             "cube".format(first))
+    corners, edges = _cubies(facelets)
+    n = len(corners)
+    # the twist of utilities.move objects turns the other way round
+    twist = (3 - corners % 3) % 3
+    flip = edges % 2
+    res = np.empty((n, 68), dtype = np.uint8)
+    res[:, :8] = corners//3
+    res[:, 8:20] = edges//2
+    res[:, 20:44] = ((twist[:, :, np.newaxis] + np.arange(3)) % 3).reshape(
+        (n, 24))
+    res[:, 44:] = np.concatenate([flip[:, :, np.newaxis],
+                                  1 - flip[:, :, np.newaxis]],
+                                 axis = 2).reshape((n, 24))
+    return res
+
+
+def from_states(states):
+    """Returns the Nx54 array of uint8 of the face indices of the stickers of
+    a Nx68 array of states."""
+    states = np.asarray(states).astype(np.int64)
+    n = len(states)
+    res = np.empty((n, 54), dtype = np.uint8)
+    res[:] = solved
+    twist = (3 - states[:, 20:44:3]) % 3
+    slots = (np.arange(3) - twist[:, :, np.newaxis]) % 3
+    res[:, corner_facelets] = corner_colours[states[:, :8, np.newaxis], slots]
+    slots = (np.arange(2) + states[:, 44::2, np.newaxis]) % 2
+    res[:, edge_facelets] = edge_colours[states[:, 8:20, np.newaxis], slots]
+    return res
+
+
+def to_state(string):
+    """Returns the 68x1 matrix of the state of the cube represented by a
+    facelet string, as used by Kube.solve. Raises a ValueError if the cube
+    is not legal."""
+    res = to_states(from_strings([string]))[0]
+    return np.transpose(np.matrix(res.astype(float)))
+
+
+def to_string(state):
+    """Returns the facelet string of the cube of a 68x1 state."""
+    state = np.rint(np.asarray(state, dtype = float).ravel())
+    return to_strings(from_states(state[np.newaxis, :]))[0]
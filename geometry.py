@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Geometry of the 26 cubies of the Rubik's cube, independent of any rendering
+library.
+
+functions
+---------
+
+cubie_centres: returns the centres of the 26 cubies in the order in which
+they are drawn
+
+cubie_quads: returns the normals, colours and vertices of the 12 quads (6
+faces of the body and 6 stickers) of a cubie
+
+cubie_mesh: returns the normals, colours and vertices of the quads of the 26
+cubies in their initial position
+
+Examples
+--------
+
+>>> import geometry as geo
+>>> normals, colours, quads = geo.cubie_quads(0.5, 0.5, 0.5)
+
+"""
+
+import numpy as np
+
+# half width of a cubie
+dc = 0.24
+
+# faces of a cubie: outward normal, axis along which the normal points and
+# colour of the sticker of the cubies lying on the positive (respectively
+# negative) side of the cube
+faces = [((0, 0, 1), 2, 1, (255, 0, 0)),
+         ((0, 1, 0), 1, 1, (0, 255, 0)),
+         ((1, 0, 0), 0, 1, (255, 255, 255)),
+         ((0, 0, -1), 2, -1, (255, 128, 0)),
+         ((0, -1, 0), 1, -1, (0, 0, 255)),
+         ((-1, 0, 0), 0, -1, (255, 255, 0))]
+
+# corners of a unit square in the plane orthogonal to each axis, in the order
+# in which they are drawn
+square = {0: [(0, -1, -1), (0, 1, -1), (0, 1, 1), (0, -1, 1)],
+          1: [(-1, 0, -1), (-1, 0, 1), (1, 0, 1), (1, 0, -1)],
+          2: [(-1, -1, 0), (1, -1, 0), (1, 1, 0), (-1, 1, 0)]}
+
+
+def cubie_centres():
+    """Returns a 26x3 array with the centres of the 26 cubies, in the order in
+    which they are indexed by the graphical representation."""
+    res = [[i*0.5, j*0.5, k*0.5] for i in range(-1,2,1)
+           for j in range(-1,2,1) for k in range(-1,2,1)
+           if (i==j==k==0)==False]
+    return np.array(res)
+
+
+def cubie_quads(x0 = 0, x1 = 0, x2 = 0):
+    """Returns the geometry of a cubie which center is in position
+    [x0, x1, x2].
+
+    The cubie is made of 12 quads: for each of its 6 faces a black square and
+    a slightly smaller sticker just above it, coloured only if the face lies
+    on the outside of the cube.
+
+    Parameters
+    ----------
+
+    x0, x1, x2: float, coordinates of the centre of the cubie
+
+    Returns
+    -------
+
+    normals: 12x3 array of the normals of the quads
+
+    colours: 12x3 array of uint8, RGB colours of the quads
+
+    quads: 12x4x3 array of the vertices of the quads, relative to the centre
+    of the cubie
+
+    """
+    x = [x0, x1, x2]
+    normals = np.zeros((12, 3))
+    colours = np.zeros((12, 3), dtype = np.uint8)
+    quads = np.zeros((12, 4, 3))
+    for f, (normal, axis, side, colour) in enumerate(faces):
+        sq = np.array(square[axis], dtype = float)
+        normals[2*f] = normal
+        normals[2*f+1] = normal
+        quads[2*f] = dc*sq
+        quads[2*f][:, axis] = side*dc
+        quads[2*f+1] = 0.9*dc*sq
+        quads[2*f+1][:, axis] = side*1.01*dc
+        if x[axis] == side*0.5:
+            colours[2*f+1] = colour
+    return normals, colours, quads
+
+
+def cubie_mesh():
+    """Returns the normals (26x12x3), colours (26x12x3) and vertices
+    (26x12x4x3) of the quads of the 26 cubies in their initial position."""
+    normals = np.zeros((26, 12, 3))
+    colours = np.zeros((26, 12, 3), dtype = np.uint8)
+    quads = np.zeros((26, 12, 4, 3))
+    for indic, centre in enumerate(cubie_centres()):
+        normals[indic], colours[indic], quads[indic] = cubie_quads(*centre)
+        quads[indic] = quads[indic] + centre
+    return normals, colours, quads
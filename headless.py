@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+Offscreen rendering of the Rubik's cube, without any display nor GPU.
+
+Description
+-----------
+
+The cubies are drawn with the geometry and colours used by the OpenGL viewer
+and the orientations computed by the animation module, through a pure NumPy
+z-buffer rasterizer. A move sequence is rendered to a stream of frames,
+written either as PNG files or as raw RGB bytes. Since the frames are
+independent, ranges of frames can be rendered in parallel processes.
+
+functions
+---------
+
+render: returns the RGB image of the cube for given cubie rotations
+
+iter_states: yields the cubie rotations of consecutive frames of an animation
+
+render_range: renders a range of frames of an animation
+
+render_frames: renders all the frames of an animation, possibly in parallel
+
+write_png: writes an RGB image as a PNG file
+
+Usage
+-----
+
+Render the resolution of a random scramble as PNG files::
+
+$ python headless.py --scramble 20 --solve --outdir frames --processes 4
+
+or pipe raw RGB frames to a video encoder::
+
+$ python headless.py --moves FRUfru --raw | ffmpeg -f rawvideo \\
+-pix_fmt rgb24 -s 256x256 -r 25 -i - out.mp4
+
+"""
+
+import os
+import sys
+import struct
+import zlib
+import argparse
+import multiprocessing
+
+import numpy as np
+
+import quaternion as quat
+import geometry as geo
+import animation as anim
+
+# same lighting as the OpenGL viewer: default global ambient light plus the
+# ambient and diffuse parts of its light, which is set in eye coordinates
+ambient = 0.2 + 0.35
+diffuse = 0.75
+light = np.array([-50.0, 50.0, 100.0])/np.linalg.norm([-50.0, 50.0, 100.0])
+
+# same projection as the OpenGL viewer
+nRange = 2.0
+
+background = (255, 255, 255)
+
+
+mesh = geo.cubie_mesh()
+
+
+def camera(xrot = 45.0, yrot = 45.0):
+    """Returns the 4x4 matrix of the camera rotation, as built by the OpenGL
+    viewer."""
+    rotation_x = quat.quaternion([1.,0.,0.], angl=-xrot)
+    rotation_y = quat.quaternion([0.,1.,0.], angl=-yrot)
+    return np.dot(rotation_y.matrix, rotation_x.matrix)
+
+
+def rasterize(tris, depths, colours, width, height):
+    """Returns the image obtained by drawing triangles with a z-buffer.
+
+    Parameters
+    ----------
+
+    tris: Tx3x2 array, pixel coordinates of the vertices of the triangles
+
+    depths: Tx3 array, depths of the vertices, the greatest is the closest
+
+    colours: Tx3 array of uint8, colours of the triangles
+
+    width, height: int, size of the image
+
+    """
+    img = np.empty((height, width, 3), dtype = np.uint8)
+    img[:] = background
+    zbuf = np.empty((height, width))
+    zbuf[:] = -np.inf
+    for t in range(len(tris)):
+        (x0, y0), (x1, y1), (x2, y2) = tris[t]
+        area = (x1 - x0)*(y2 - y0) - (x2 - x0)*(y1 - y0)
+        if abs(area) < 1e-12:
+            continue
+        xmin = max(int(np.floor(min(x0, x1, x2))), 0)
+        xmax = min(int(np.ceil(max(x0, x1, x2))), width - 1)
+        ymin = max(int(np.floor(min(y0, y1, y2))), 0)
+        ymax = min(int(np.ceil(max(y0, y1, y2))), height - 1)
+        if xmin > xmax or ymin > ymax:
+            continue
+        xs, ys = np.meshgrid(np.arange(xmin, xmax + 1) + 0.5,
+                             np.arange(ymin, ymax + 1) + 0.5)
+        w0 = ((x1 - xs)*(y2 - ys) - (x2 - xs)*(y1 - ys))/area
+        w1 = ((x2 - xs)*(y0 - ys) - (x0 - xs)*(y2 - ys))/area
+        w2 = 1. - w0 - w1
+        z = w0*depths[t, 0] + w1*depths[t, 1] + w2*depths[t, 2]
+        sub = zbuf[ymin:(ymax + 1), xmin:(xmax + 1)]
+        closer = (w0 >= 0) & (w1 >= 0) & (w2 >= 0) & (z > sub)
+        sub[closer] = z[closer]
+        img[ymin:(ymax + 1), xmin:(xmax + 1)][closer] = colours[t]
+    return img
+
+
+def render(quater, width = 256, height = 256, xrot = 45.0, yrot = 45.0):
+    """Returns the height x width x 3 RGB image of the cube.
+
+    Parameters
+    ----------
+
+    quater: QuaternionArray of the rotations of the 26 cubies, as held by an
+    animation.cubies object
+
+    width, height: (optional) int, size of the image in pixels
+
+    xrot, yrot: (optional) float, camera angles in degrees
+
+    """
+    normals, colours, quads = mesh
+    # the viewer hands these matrices to OpenGL which reads them column by
+    # column, the eye coordinates are thus obtained with their transposes
+    models = np.dot(quater.matrices(), camera(xrot, yrot))[:, :3, :3]
+    eye = np.einsum('nji,nqvj->nqvi', models, quads)
+    eye_normals = np.einsum('nji,nqj->nqi', models, normals)
+
+    visible = eye_normals[:, :, 2] > 0
+    eye = eye[visible]
+    eye_normals = eye_normals[visible]
+    shade = ambient + diffuse*np.maximum(np.dot(eye_normals, light), 0.)
+    shaded = np.minimum(colours[visible]*shade[:, np.newaxis], 255.)
+
+    if width <= height:
+        half_w, half_h = nRange, nRange*height/width
+    else:
+        half_w, half_h = nRange*width/height, nRange
+    px = (eye[:, :, 0] + half_w)/(2.*half_w)*width
+    py = (half_h - eye[:, :, 1])/(2.*half_h)*height
+    xy = np.concatenate([px[:, :, np.newaxis], py[:, :, np.newaxis]], axis=2)
+
+    # each quad is drawn as two triangles
+    tris = np.concatenate([xy[:, [0, 1, 2]], xy[:, [0, 2, 3]]])
+    depths = np.concatenate([eye[:, [0, 1, 2], 2], eye[:, [0, 2, 3], 2]])
+    tri_colours = np.concatenate([shaded, shaded]).astype(np.uint8)
+    return rasterize(tris, depths, tri_colours, width, height)
+
+
+def n_frames(actions, fps = 25, duration = 0.25):
+    """Returns the number of frames of the animation of actions, the last one
+    showing the final state."""
+    return int(np.ceil(len(actions)*duration*fps)) + 1
+
+
+def iter_states(actions, start = 0, stop = None, fps = 25, duration = 0.25):
+    """Yields the QuaternionArray of the cubie rotations of the frames start to
+    stop of the animation of actions. The turns preceding the first frame
+    are applied instantly, so that any range of frames can be computed on its
+    own.
+
+    Parameters
+    ----------
+
+    actions: char list, names of the consecutive fundamental moves
+
+    start, stop: (optional) int, range of the frames
+
+    fps: (optional) float, number of frames per second
+
+    duration: (optional) float, duration of a quarter turn in seconds
+
+    """
+    if stop is None:
+        stop = n_frames(actions, fps, duration)
+    cube = anim.cubies()
+    done = 0
+    started = False
+    applied = 0.
+    for i in range(start, stop):
+        turns, frac = divmod(i/float(fps), duration)
+        turns = min(int(turns), len(actions))
+        while done < turns:
+            if not started:
+                cube.make_a_move(actions[done])
+            cube.advance(90.)
+            done += 1
+            started = False
+            applied = 0.
+        if done < len(actions) and frac > 0:
+            if not started:
+                cube.make_a_move(actions[done])
+                started = True
+            angle = 90.*frac/duration
+            cube.advance(angle - applied)
+            applied = angle
+        yield cube.quater
+
+
+def render_range(args):
+    """Renders the frames start to stop of the animation of actions. Returns
+    the list of the raw RGB bytes of the frames, or writes them as PNG files
+    in outdir if it is not None and returns the list of the file names.
+
+    Parameters
+    ----------
+
+    args: tuple (actions, start, stop, outdir, options) where options is a
+    dict of keyword arguments of render and iter_states
+
+    """
+    actions, start, stop, outdir, options = args
+    options = dict(options)
+    fps = options.pop('fps', 25)
+    duration = options.pop('duration', 0.25)
+    res = []
+    states = iter_states(actions, start, stop, fps, duration)
+    for i, quater in enumerate(states, start):
+        img = render(quater, **options)
+        if outdir is None:
+            res.append(img.tostring())
+        else:
+            name = os.path.join(outdir, "frame_{0:05d}.png".format(i))
+            write_png(name, img)
+            res.append(name)
+    return res
+
+
+def render_frames(actions, outdir = None, stream = None, processes = 1,
+                  chunk = 25, **options):
+    """Renders all the frames of the animation of actions, by chunks of
+    frames rendered in parallel processes.
+
+    Parameters
+    ----------
+
+    actions: char list, names of the consecutive fundamental moves
+
+    outdir: (optional) str, directory in which the frames are written as PNG
+    files
+
+    stream: (optional) file object to which the raw RGB frames are written,
+    in order, if outdir is None
+
+    processes: (optional) int, number of processes
+
+    chunk: (optional) int, number of consecutive frames rendered by a process
+    at a time
+
+    options: keyword arguments of render (width, height, xrot, yrot) and
+    iter_states (fps, duration)
+
+    """
+    total = n_frames(actions, options.get('fps', 25),
+                     options.get('duration', 0.25))
+    tasks = [(actions, start, min(start + chunk, total), outdir, options)
+             for start in range(0, total, chunk)]
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(render_range, tasks)
+    else:
+        pool = None
+        results = (render_range(task) for task in tasks)
+    for frames in results:
+        if outdir is None and stream is not None:
+            for frame in frames:
+                stream.write(frame)
+    if pool is not None:
+        pool.close()
+        pool.join()
+    return total
+
+
+def write_png(name, img):
+    """Writes the height x width x 3 uint8 RGB image img as the PNG file
+    name."""
+    height, width = img.shape[:2]
+    raw = np.zeros((height, 1 + 3*width), dtype = np.uint8)
+    raw[:, 1:] = img.reshape((height, 3*width))
+
+    def chunk(kind, data):
+        res = struct.pack(">I", len(data)) + kind + data
+        return res + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    with open(name, 'wb') as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2,
+                                           0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tostring(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Renders the animation of"
+                                     " a move sequence without any display.")
+    parser.add_argument("--moves", default = "", help = "sequence of "
+                        "fundamental moves, e.g. FRUfru")
+    parser.add_argument("--scramble", type = int, default = 0, help =
+                        "number of random moves appended to the sequence")
+    parser.add_argument("--solve", action = "store_true", help = "append "
+                        "the solution of the sequence")
+    parser.add_argument("--size", type = int, default = 256)
+    parser.add_argument("--fps", type = float, default = 25)
+    parser.add_argument("--duration", type = float, default = 0.25, help =
+                        "duration of a quarter turn in seconds")
+    parser.add_argument("--processes", type = int, default = 1)
+    parser.add_argument("--outdir", help = "directory of the PNG frames")
+    parser.add_argument("--raw", action = "store_true", help = "write raw "
+                        "RGB frames to the standard output")
+    args = parser.parse_args()
+
+    actions = list(args.moves)
+    if args.scramble > 0 or args.solve:
+        import Kube as kb
+        actions = actions + kb.rand_move(args.scramble)
+        if args.solve:
+            actions = actions + sum(kb.solve_iter(
+                kb.move_list_to_state(actions)), [])
+
+    if args.outdir is None and not args.raw:
+        parser.error("either --outdir or --raw is required")
+    if args.outdir is not None and not os.path.isdir(args.outdir):
+        os.makedirs(args.outdir)
+    stream = sys.stdout if args.raw else None
+    if stream is not None and hasattr(stream, 'buffer'):
+        stream = stream.buffer
+    total = render_frames(actions, args.outdir, stream, args.processes,
+                          width = args.size, height = args.size,
+                          fps = args.fps, duration = args.duration)
+    sys.stderr.write("{0} frames rendered\n".format(total))
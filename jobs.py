@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Long running jobs which can be stopped and resumed where they stopped.
+
+Description
+-----------
+
+A job records its progress in a checkpoint file, a small JSON document
+written atomically (to a temporary file which then replaces the checkpoint)
+and holding the CRC32 of its own content, so that a job killed at any time
+finds either the previous checkpoint or the new one, and never a truncated
+one.
+
+The resolution of a corpus of scrambles (see the corpus module) proceeds by
+shards of consecutive scrambles, the solutions of each shard being appended
+to the corpus of the solutions before the number of scrambles done is
+recorded. A restarted job drops the solutions written after the last
+checkpoint, checks that the solutions of the last shard done solve their
+scrambles, and goes on with the next shard.
+
+The breadth first tables of the tables module are checkpointed the same way,
+layer by layer (see tables.build).
+
+functions
+---------
+
+save_checkpoint: atomically writes a checkpoint
+
+load_checkpoint: reads and checks a checkpoint
+
+solve_corpus: solves a corpus of scrambles, shard by shard
+
+Usage
+-----
+
+Solve the scrambles of scrambles.seq into solutions.seq, by shards of 1000
+scrambles, resuming the job if it was stopped::
+
+$ python jobs.py scrambles.seq solutions.seq --shard 1000 --threads 4
+
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+
+import batch
+import corpus
+import Kube as kb
+
+
+def _crc(data):
+    return zlib.crc32(json.dumps(data, sort_keys = True).encode('ascii')) & \
+        0xffffffff
+
+
+def save_checkpoint(name, data):
+    """Atomically replaces the checkpoint file name by a dict of JSON
+    serializable data."""
+    tmp = name + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'data': data, 'crc': _crc(data)}, f, sort_keys = True)
+        f.flush()
+        os.fsync(f.fileno())
+    if os.name == 'nt' and os.path.exists(name):
+        os.remove(name)
+    os.rename(tmp, name)
+
+
+def load_checkpoint(name):
+    """Returns the data of the checkpoint file name, or None if there is
+    none. Raises a ValueError if the checkpoint is corrupted."""
+    if not os.path.exists(name):
+        return None
+    try:
+        with open(name) as f:
+            content = json.load(f)
+        data = content['data']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("{0} is not a checkpoint".format(name))
+    if content['crc'] != _crc(data):
+        raise ValueError("{0} is corrupted".format(name))
+    return data
+
+
+def _states(scrambles, start, stop):
+    """Returns the Nx68 states of the scrambles start to stop of a corpus
+    reader."""
+    codes, offsets = scrambles.packed(start, stop)
+    return batch.apply_codes(batch.solved_states(stop - start),
+                             batch.unpack(codes, offsets))
+
+
+def solve_corpus(scrambles, solutions, shard = 1000, threads = 1,
+                 verbose = True):
+    """Solves the scrambles of a corpus file and writes their solutions, in
+    the same order, to another corpus file, by shards of consecutive
+    scrambles. The progress is recorded in the checkpoint file solutions +
+    '.ckpt' after each shard, and a job started again resumes after the last
+    shard recorded. Returns the number of scrambles solved.
+
+    Parameters
+    ----------
+
+    scrambles: str, name of the corpus file of the scrambles
+
+    solutions: str, name of the corpus file of the solutions
+
+    shard: (optional) int, number of scrambles solved between two
+    checkpoints
+
+    threads: (optional) int, number of threads solving a shard
+
+    verbose: (optional) bool, if True the progress is printed
+
+    """
+    ckpt = solutions + '.ckpt'
+    r = corpus.reader(scrambles)
+    n = len(r)
+    done = 0
+    state = load_checkpoint(ckpt)
+    if state is not None:
+        if state['scrambles'] != os.path.abspath(scrambles):
+            raise ValueError("{0} records the resolution of {1}".format(
+                ckpt, state['scrambles']))
+        done = state['done']
+        last = state['last']
+        # the solutions written after the checkpoint are dropped, and the
+        # ones of the last shard must still solve their scrambles
+        if len(corpus.reader(solutions)) < done:
+            raise ValueError("{0} has fewer solutions than recorded in "
+                             "{1}".format(solutions, ckpt))
+        with corpus.writer(solutions, append = True, keep = done):
+            pass
+        codes, offsets = corpus.reader(solutions).packed(last, done)
+        ok, first = batch.verify(_states(r, last, done), codes, offsets)
+        if first >= 0:
+            raise ValueError("the solution {0} of {1} does not solve its "
+                             "scramble".format(last + first, solutions))
+        if verbose:
+            print "resuming after {0} scrambles out of {1}".format(done, n)
+    with corpus.writer(solutions, append = done > 0) as w:
+        for start in range(done, n, shard):
+            t = time.time()
+            stop = min(start + shard, n)
+            w.write_many(kb.solve_many(_states(r, start, stop), threads))
+            w.flush()
+            save_checkpoint(ckpt, {'scrambles': os.path.abspath(scrambles),
+                                   'done': stop, 'last': start})
+            if verbose:
+                print "{0} scrambles out of {1} ({2:.1f} s)".format(
+                    stop, n, time.time() - t)
+    return n - done
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Solves a corpus of "
+                                     "scrambles, resuming the job where it "
+                                     "stopped.")
+    parser.add_argument("scrambles")
+    parser.add_argument("solutions")
+    parser.add_argument("--shard", type = int, default = 1000)
+    parser.add_argument("--threads", type = int, default = 1)
+    args = parser.parse_args()
+    solve_corpus(args.scrambles, args.solutions, args.shard, args.threads)
+    sys.exit(0)
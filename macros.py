@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Offline discovery of short macros for the solver.
+
+The solver relies on a few macros (corner switcher M0, corner flipper M1,
+edge switchers M20 to M23 and edge flippers M30 and M31) whose lengths
+multiply the length of every solution. This tool looks for the shortest
+sequences of moves of Kube.fund_l having the same effect as each of them on
+the part of the cube its phase of the resolution cares about, the rest of the
+cube being free, and writes them to the macro library loaded by Kube.
+
+The search is a meet-in-the-middle one: breadth first searches grow at once
+from the solved cube and from the effect of the macro, on batches of states
+moved by index gathers, until they meet.
+
+functions
+---------
+
+projection: returns the entries of the state a phase of the resolution cares
+about
+
+search: returns the shortest sequence of moves of Kube.fund_l with a given
+effect
+
+discover: returns the shortest known sequences for all the macros
+
+write_library: writes macros to a library file
+
+Usage
+-----
+
+Rebuild the macro library loaded by Kube, searching up to 6 moves from each
+side::
+
+$ python macros.py --depth 6
+
+or the fastest ones for a robot turning opposite faces at once::
+
+$ python macros.py --depth 6 --cost 1 1.6 0.8
+
+"""
+
+import sys
+import time
+import argparse
+
+import numpy as np
+
+import Kube as kb
+
+# entries of the 68 entries state: corner positions, edge positions, corner
+# orientations, edge orientations
+corner_pos = range(8)
+edge_pos = range(8, 20)
+corner_ori = range(20, 44)
+edge_ori = range(44, 68)
+
+# part of the state on which the effect of each macro must be reproduced: the
+# corner phases ignore the edges, the edge position phase ignores the flips
+scopes = {'M0': corner_pos + corner_ori,
+          'M1': corner_pos + corner_ori,
+          'M20': corner_pos + edge_pos + corner_ori,
+          'M21': corner_pos + edge_pos + corner_ori,
+          'M22': corner_pos + edge_pos + corner_ori,
+          'M23': corner_pos + edge_pos + corner_ori,
+          'M30': range(68),
+          'M31': range(68)}
+
+# faces of the moves of Kube.fund_l, opposite faces being 3 apart
+face_order = "FRUBLD"
+
+moves = kb.fund_l
+index = np.array([m.to_index() for m in moves])
+face = np.array([face_order.index(m.decompo[0].upper()) for m in moves])
+
+# random weights hashing the states into 64 bits keys
+weights = np.random.RandomState(0).randint(1, 2**62, 68).astype(np.uint64)
+
+
+def projection(state, scope):
+    """Returns the entries scope of a 68x1 state, as an array of uint8."""
+    return np.asarray(state).ravel()[scope].astype(np.uint8)
+
+
+def _keys(states):
+    """Returns the 64 bits hashes of the rows of states."""
+    return (states.astype(np.uint64)*weights[:states.shape[1]]).sum(axis = 1)
+
+
+class _side():
+    """Breadth first search from a state, one level at a time. Each level
+    holds the keys of the new states reached, the index of their parent in
+    the previous level and the index in Kube.fund_l of the last move. Only
+    the states of the last level are kept, to be moved further."""
+    def __init__(self, start, gathers):
+        self.gathers = gathers
+        self.states = start[np.newaxis, :]
+        self.keys = [_keys(self.states)]
+        self.parents = [np.zeros(1, dtype = np.int32)]
+        self.last = [np.array([-1], dtype = np.int8)]
+        self.seen = self.keys[0]
+
+    def depth(self):
+        return len(self.keys) - 1
+
+    def _allowed(self, k):
+        """Returns the indices of the states of the last level which can be
+        followed by the move k: no two moves of the same face in a row, and
+        moves of opposite faces, which commute, only in one order."""
+        last = self.last[-1]
+        prev = face[np.maximum(last, 0)]
+        ok = (last < 0) | ((face[k] != prev) & 
+                           (((face[k] - prev) % 6 != 3) | (face[k] > prev)))
+        return np.nonzero(ok)[0]
+
+    def expand(self, keep_states = True):
+        """Adds the level of the states one move further. The new states are
+        kept only if keep_states is True, the search being over otherwise."""
+        keys, parents, moved = [], [], []
+        for k in range(len(self.gathers)):
+            sel = self._allowed(k)
+            keys.append(_keys(self.states[sel][:, self.gathers[k]]))
+            parents.append(sel.astype(np.int32))
+            moved.append(np.repeat(np.int8(k), len(sel)))
+        keys, first = np.unique(np.concatenate(keys), return_index = True)
+        fresh = ~np.in1d(keys, self.seen)
+        first = first[fresh]
+        parents = np.concatenate(parents)[first]
+        moved = np.concatenate(moved)[first]
+        if keep_states:
+            states = np.empty((len(first), self.states.shape[1]), 
+                              dtype = np.uint8)
+            for k in range(len(self.gathers)):
+                sel = np.nonzero(moved == k)[0]
+                states[sel] = self.states[parents[sel]][:, self.gathers[k]]
+        else:
+            states = None
+        self.states = states
+        self.keys.append(keys[fresh])
+        self.parents.append(parents)
+        self.last.append(moved)
+        self.seen = np.concatenate([self.seen, keys[fresh]])
+
+    def path(self, level, i):
+        """Returns the indices in Kube.fund_l of the moves leading to the
+        state i of a level."""
+        res = []
+        while level > 0:
+            res.append(self.last[level][i])
+            i = self.parents[level][i]
+            level -= 1
+        return res[::-1]
+
+
+def _chars(path):
+    """Returns the list of chars of a list of indices in Kube.fund_l."""
+    return sum([moves[k].decompo for k in path], [])
+
+
+def _inverse(chars):
+    """Returns the list of chars of the inverse of a list of chars."""
+    return [a.swapcase() for a in chars[::-1]]
+
+
+def search(target, scope, depth = 6, cost = len):
+    """Returns the list of chars of a shortest sequence of moves of
+    Kube.fund_l whose effect on the entries scope of the state is target,
+    the cheapest one being preferred among them, or None if there is none of
+    at most 2*depth moves.
+
+    Parameters
+    ----------
+
+    target: array of uint8, entries scope of the state of the cube after the
+    sequence
+
+    scope: list of int, entries of the 68 entries state taken into account
+
+    depth: (optional) int, maximum number of moves searched from each side
+
+    cost: (optional) function returning the cost of a list of chars, the
+    number of quarter turns by default (see robot.cost_model)
+
+    """
+    # the entries of the scope are only ever moved among themselves
+    where = np.zeros(68, dtype = np.int64)
+    where[scope] = range(len(scope))
+    gathers = where[index[:, scope]]
+    solved = projection(kb.move_list_to_state([]), scope)
+    sides = [_side(solved, gathers), _side(np.asarray(target), gathers)]
+    grow, other = sides
+    while True:
+        # no shorter sequence went unnoticed at the previous levels, so all
+        # the meetings of the new level are shortest sequences
+        found = []
+        for b in range(len(other.keys)):
+            both, i, j = np.intersect1d(grow.keys[-1], other.keys[b],
+                                        return_indices = True)
+            found += [(i[n], b, j[n]) for n in range(len(both))]
+        if grow is sides[1]:
+            found = [(b, j, grow.depth(), i) for i, b, j in found]
+        else:
+            found = [(grow.depth(), i, b, j) for i, b, j in found]
+        res = [_chars(sides[0].path(a, i)) +
+               _inverse(_chars(sides[1].path(b, j))) for a, i, b, j in found]
+        res = [r for r in res if (projection(kb.move_list_to_state(r),
+                                             scope) == target).all()]
+        if res:
+            return min(res, key = cost)
+        if sides[0].depth() <= sides[1].depth():
+            grow, other = sides
+        else:
+            other, grow = sides
+        if grow.depth() >= depth:
+            return None
+        grow.expand(grow.depth() + 1 < depth)
+
+
+def discover(depth = 6, verbose = True, cost = len):
+    """Returns the dict from the names of the macros of Kube to the shortest
+    list of chars found with the same effect, the hard coded sequence being
+    kept when nothing cheaper is found.
+
+    Parameters
+    ----------
+
+    depth: (optional) int, maximum number of moves searched from each side
+
+    verbose: (optional) bool, if True the progress is printed
+
+    cost: (optional) function returning the cost of a list of chars, the
+    number of quarter turns by default (see robot.cost_model)
+
+    """
+    res = {}
+    for name in sorted(scopes):
+        t = time.time()
+        macro = getattr(kb, name)
+        scope = scopes[name]
+        target = projection(kb.move_list_to_state(macro.decompo), scope)
+        found = search(target, scope, depth, cost)
+        if found is None or cost(found) >= cost(macro.decompo):
+            res[name] = macro.decompo
+        else:
+            res[name] = found
+        if verbose:
+            print "{0}: {1} -> {2} moves ({3:.1f} s)".format(name,
+                len(macro.decompo), len(res[name]), time.time() - t)
+    return res
+
+
+def write_library(macros, name = kb.macro_file):
+    """Writes macros, a dict from names to lists of chars, to the library
+    file name, one macro per line."""
+    with open(name, 'w') as f:
+        f.write("# macros of the solver, as found by macros.py\n")
+        for m in sorted(macros):
+            f.write("{0} {1}\n".format(m, "".join(macros[m])))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Searches short macros "
+                                     "for the solver and writes the macro "
+                                     "library loaded by Kube.")
+    parser.add_argument("--depth", type = int, default = 6, help = "maximum"
+                        " number of moves searched from each side")
+    parser.add_argument("--output", default = kb.macro_file)
+    parser.add_argument("--cost", type = float, nargs = 3, metavar = 
+                        ("QUARTER", "HALF", "PARALLEL"), help = "times of "
+                        "the turns of a robot (see robot.cost_model) to "
+                        "minimize instead of the number of quarter turns")
+    args = parser.parse_args()
+    cost = len
+    if args.cost is not None:
+        import robot
+        cost = robot.cost_model(*args.cost).cost
+    write_library(discover(args.depth, cost = cost), args.output)
+    sys.exit(0)
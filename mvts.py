@@ -32,6 +32,11 @@ control it by using your keyboard. In particular you can:
     direction when pressing the `U` (resp. `u`) key
     * Move the downer face in the clockwise (respectively counterclockwise) 
     direction when pressing the `D` (resp. `d`) key
+    * double (respectively halve) the playback rate by pressing the `+` 
+    (resp. `-`) key
+    * jump to the end of the planned moves by pressing the `j` key
+    * switch between the display list and the immediate mode renderers by 
+    pressing the `m` key, the mean frame time of the previous one is printed
     * quit and close the window by pressing the `q` or `esc` key
 
 Notes
@@ -51,6 +56,10 @@ import logging
 logging.getLogger('OpenGL').addHandler(logging.NullHandler())
 
 import sys
+import time
+import collections
+import threading
+import Queue
 
 from OpenGL.GL import *
 from OpenGL.GLU import *
@@ -59,8 +68,9 @@ from OpenGL.GLUT import *
 import numpy as np
 
 import quaternion as quat
+import geometry as geo
+import animation as anim
 import Kube as kb
-import utilities as utl
 
 # Set the width and height of the window
 global width
@@ -75,56 +85,49 @@ global mesg1, mesg2, mesg3, mesg4, mesg5
 mesg1 = ""
 mesg2 = ""
 mesg3 = "press 'a' to randomly move the cube"
-mesg4 = "press 's' to solve it (it might take several seconds)"
+mesg4 = "press 's' to solve it (the moves start as soon as they are found)"
 mesg5 = "use arrow keys to change the camera point of view"
 
-# Global variables for movements
-global xrot, yrot
-global X, Y, Z
-global quater
-global rotx, roty, rotz
-global maxx, maxy, maxz
-global A, B, C, D, E, F, Vpos, pos
-global Ma, Mb, Mc, Md, Me, Mf
-global Speed 
-global cur_mov
-global actions
-
-cur_mov = 0
+# Global variables for the rendering: whether the cubies are drawn with their
+# display lists (retained mode) or in immediate mode, the first display list
+# and the last frame times measured in each mode
+global retained, cubie_lists, frame_times
 
-actions = []
+retained = True
+cubie_lists = 0
+frame_times = {True: collections.deque(maxlen = 500), 
+               False: collections.deque(maxlen = 500)}
 
-quater = [quat.quaternion([0.,0.,0.], angl = 0) for i in range(26)]
+# Global variables for movements
+global xrot, yrot
+global cube
+global sched
+global actions, state
+global solver, solutions, pending, found
+
+# queue of the planned moves, the move in progress first, and state of the 
+# cube once the moves already executed, which are dropped from the queue
+actions = collections.deque()
+state = kb.move_list_to_state([])
+
+# Global variables for the background resolution: the solver thread, the 
+# thread-safe queue through which it sends the moves it finds and the moves
+# asked by the user while it is running
+solver = None
+solutions = Queue.Queue()
+pending = collections.deque()
+found = 0
 
-rotx = 0.*np.ones(26)
-roty = 0.*np.ones(26)
-rotz = 0.*np.ones(26)
 xrot = 45.0
 yrot = 45.0
-X = np.zeros((26,3))
-Y = np.zeros((26,3))
-Z = np.zeros((26,3))
-X[:,0] = 1.
-Y[:,1] = 1.
-Z[:,2] = 1. 
-maxx = np.copy(rotx)
-maxy = np.copy(roty)
-maxz = np.copy(rotz)
 
-Speed = 6 
+# positions and orientations of the 26 cubies
+cube = anim.cubies()
 
-Vpos = np.transpose(np.matrix(np.array(range(26))))
+# each quarter turn lasts 0.25 s at playback rate 1, whatever the frame rate
+sched = anim.scheduler(duration = 0.25)
 
-pos = np.asarray(np.transpose(Vpos))[0]
-
-A = range(9)
-B = range(17,26)
-C = [0, 1, 2, 9, 10, 11, 17, 18, 19]
-D = [6, 7, 8, 14, 15, 16, 23, 24, 25]
-E = [0, 3, 6, 9, 12, 14, 17, 20, 23]
-F = [2, 5, 8, 11, 13, 16, 19, 22, 25]
-
-Ma = Mb = Mc = Md = Me = Mf = np.matrix(np.identity(26))
+centres = geo.cubie_centres().tolist()
 
 # Light value and coordonates
 global ambientlight
@@ -137,237 +140,105 @@ diffuseLight = ( 0.75, 0.75, 0.75, 0.7)
 specular = (1.0, 1.0, 1.0, 1.0)
 specref = (1.0, 1.0, 1.0, 1.0)
 
-n = 26
 
-B1 = utl.T(n, 0, 6)*utl.T(n, 0, 8)*utl.T(n, 0, 2)
-B2 = utl.T(n, 1, 3)*utl.T(n, 1, 7)*utl.T(n, 1, 5)
-Ma = B1*B2
+# defintion of functions used by the program
+def trace(x0 = 0, x1 = 0, x2 = 0):
+    """Draw a cube which center is in position [x1, x2, x3]"""
+    normals, colours, quads = geo.cubie_quads(x0, x1, x2)
+    for normal, colour, quad in zip(normals.tolist(), colours.tolist(), 
+                                    quads.tolist()):
+        glBegin(GL_POLYGON)
+        glColor3ub(*colour)
+        glNormal3f(*normal)
+        for vertex in quad:
+            glVertex3f(*vertex)
+        glEnd()
+
+
+def compile_cubies():
+    """Compiles the 26 cubies, translated to their initial position, into 
+    OpenGL display lists so that each of them is then drawn with a single 
+    call. Returns the index of the first list."""
+    first = glGenLists(26)
+    for indic, centre in enumerate(geo.cubie_centres().tolist()):
+        glNewList(first + indic, GL_COMPILE)
+        glTranslatef(*centre)
+        trace(*centre)
+        glEndList()
+    return first
+
+
+def draw_cubie(indic, centre):
+    """Draws the cubie number indic which initial center is centre, either 
+    with its display list or in immediate mode."""
+    if retained:
+        glCallList(cubie_lists + indic)
+    else:
+        glTranslatef(*centre)
+        trace(*centre)
 
-B1 = utl.T(n, 0+17, 6+17)*utl.T(n, 0+17, 8+17)*utl.T(n, 0+17, 2+17)
-B2 = utl.T(n, 1+17, 3+17)*utl.T(n, 1+17, 7+17)*utl.T(n, 1+17, 5+17)
-Mb = B1*B2
 
-B1 = utl.T(n, 0, 2)*utl.T(n, 0, 19)*utl.T(n, 0, 17)
-B2 = utl.T(n, 1, 11)*utl.T(n, 1, 18)*utl.T(n, 1, 9)
-Mc = B1*B2
+def enqueue(moves):
+    """Appends a list of moves to the queue of the planned moves."""
+    actions.extend(moves)
 
-B1 = utl.T(n, 6, 8)*utl.T(n, 6, 25)*utl.T(n, 6, 23)
-B2 = utl.T(n, 7, 16)*utl.T(n, 7, 24)*utl.T(n, 7, 14)
-Md = B1*B2
 
-B1 = utl.T(n, 0, 17)*utl.T(n, 0, 23)*utl.T(n, 0, 6)
-B2 = utl.T(n, 3, 9)*utl.T(n, 3, 20)*utl.T(n, 3, 14)
-Me = B1*B2
+def queue_depth():
+    """Returns the number of planned moves, the one in progress included."""
+    return len(actions)
 
-B1 = utl.T(n, 2, 19)*utl.T(n, 2, 25)*utl.T(n, 2, 8)
-B2 = utl.T(n, 5, 11)*utl.T(n, 5, 22)*utl.T(n, 5, 16)
-Mf = B1*B2
 
+def start_turn(now):
+    """Starts the next move of the actions queue at time now, if there is one
+    and if no other move is in progress."""
+    if not sched.in_progress() and actions:
+        make_a_move(actions[0])
+        sched.begin(now)
 
-# defintion of functions used by the program
-def trace(x0 = 0, x1 = 0, x2 = 0):
-    """Draw a cube which center is in position [x1, x2, x3]"""
-    dc = 0.24    
-    
-    glBegin(GL_POLYGON)
-    glColor3ub(0, 0, 0)
-    glNormal3f(0, 0, 1)
-    glVertex3f(-dc, -dc, dc)
-    glVertex3f(dc, -dc, dc)
-    glVertex3f(dc, dc, dc)
-    glVertex3f(-dc, dc, dc)
-    glEnd()    
-    
-    glBegin(GL_POLYGON)
-    if x2 ==1.*0.5:
-        glColor3ub(255, 00, 00)
-    else:
-        glColor3ub(0, 0, 0)
-    glNormal3f(0, 0, 1)
-    glVertex3f(-0.9*dc, -0.9*dc, 1.01*dc)
-    glVertex3f(0.9*dc, -0.9*dc, 1.01*dc)
-    glVertex3f(0.9*dc, 0.9*dc, 1.01*dc)
-    glVertex3f(-0.9*dc, 0.9*dc, 1.01*dc)
-    glEnd()
-
-    glBegin(GL_POLYGON)
-    glColor3ub(0, 0, 0)
-    glNormal3f(0, 1, 0)
-    glVertex3f(-dc, dc, -dc)
-    glVertex3f(-dc, dc, dc)
-    glVertex3f(dc, dc, dc)
-    glVertex3f(dc, dc, -dc)
-    glEnd()
-
-    glBegin(GL_POLYGON)
-    if x1 ==1.*0.5:
-        glColor3ub(0, 255, 00)
-    else:
-        glColor3ub(0, 0, 0)
-    glNormal3f(0, 1, 0)
-    glVertex3f(-0.9*dc, 1.01*dc, -0.9*dc)
-    glVertex3f(-0.9*dc, 1.01*dc, 0.9*dc)
-    glVertex3f(0.9*dc, 1.01*dc, 0.9*dc)
-    glVertex3f(0.9*dc, 1.01*dc, -0.9*dc)
-    glEnd()
-
-    glBegin(GL_POLYGON)
-    glColor3ub(0, 0, 0)
-    glNormal3f(1, 0, 0)
-    glVertex3f(dc, -dc, -dc)
-    glVertex3f(dc, dc, -dc)
-    glVertex3f(dc, dc, dc)
-    glVertex3f(dc, -dc, dc)
-    glEnd()
-
-    glBegin(GL_POLYGON)
-    if x0 ==1.*0.5:
-        glColor3ub(255, 255, 255)
-    else:
-        glColor3ub(0, 0, 0)
-    glNormal3f(1, 0, 0)
-    glVertex3f(1.01*dc, -0.9*dc, -0.9*dc)
-    glVertex3f(1.01*dc, 0.9*dc, -0.9*dc)
-    glVertex3f(1.01*dc, 0.9*dc, 0.9*dc)
-    glVertex3f(1.01*dc, -0.9*dc, 0.9*dc)
-    glEnd()
-
-    glBegin(GL_POLYGON)
-    glColor3ub(0, 0, 0)
-    glNormal3f(0, 0, -1)
-    glVertex3f(-dc, -dc, -dc)
-    glVertex3f(dc, -dc, -dc)
-    glVertex3f(dc, dc, -dc)
-    glVertex3f(-dc, dc, -dc)
-    glEnd()
-
-    glBegin(GL_POLYGON)
-    if x2 ==-1.*0.5:
-        glColor3ub(255, 128, 00)
-    else:
-        glColor3ub(0, 0, 0)
-    glNormal3f(0, 0, -1)
-    glVertex3f(-0.9*dc, -0.9*dc, -1.01*dc)
-    glVertex3f(0.9*dc, -0.9*dc, -1.01*dc)
-    glVertex3f(0.9*dc, 0.9*dc, -1.01*dc)
-    glVertex3f(-0.9*dc, 0.9*dc, -1.01*dc)
-    glEnd()
-
-    glBegin(GL_POLYGON)
-    glColor3ub(0, 0, 0)
-    glNormal3f(0, -1, 0)
-    glVertex3f(-dc, -dc, -dc)
-    glVertex3f(-dc, -dc, dc)
-    glVertex3f(dc, -dc, dc)
-    glVertex3f(dc, -dc, -dc)
-    glEnd()
-
-    glBegin(GL_POLYGON)
-    if x1 ==-1.*0.5:
-        glColor3ub(00, 00, 255)
-    else:
-        glColor3ub(0, 0, 0)
-    glNormal3f(0, -1, 0)
-    glVertex3f(-0.9*dc, -1.01*dc, -0.9*dc)
-    glVertex3f(-0.9*dc, -1.01*dc, 0.9*dc)
-    glVertex3f(0.9*dc, -1.01*dc, 0.9*dc)
-    glVertex3f(0.9*dc, -1.01*dc, -0.9*dc)
-    glEnd()
-
-    glBegin(GL_POLYGON)
-    glColor3ub(0, 0, 0)
-    glNormal3f(-1, 0, 0)
-    glVertex3f(-dc, -dc, -dc)
-    glVertex3f(-dc, dc, -dc)
-    glVertex3f(-dc, dc, dc)
-    glVertex3f(-dc, -dc, dc)
-    glEnd()
-
-    glBegin(GL_POLYGON)
-    if x0 ==-1.*0.5:
-        glColor3ub(255, 255, 00)
-    else:
-        glColor3ub(0, 0, 0)
-    glNormal3f(-1, 0, 0)
-    glVertex3f(-1.01*dc, -0.9*dc, -0.9*dc)
-    glVertex3f(-1.01*dc, 0.9*dc, -0.9*dc)
-    glVertex3f(-1.01*dc, 0.9*dc, 0.9*dc)
-    glVertex3f(-1.01*dc, -0.9*dc, 0.9*dc)
-    glEnd()
-
-
-def update_cur_mov():
-    """Updates the global variable cur_mov, reprsenting the current position in
-    the action lists."""
-    global rotx, roty, rotz
-    global maxx, maxy, maxz
-    global cur_mov
-    if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-        cur_mov += 1
-
-
-def find_dir(alpha, beta):
-    """Determines the rotating direction and movement speed"""
-    global Speed
-    poss = [1, 2, 3, 5, 6, 9, 10, 15]
-    if beta > alpha:
-        res = 1.0
-    if beta < alpha:
-        res = -1.0
-    return res*poss[min(max(0, int(Speed-1)),len(poss)-1)]
+
+def animate():
+    """Advances the moves to where they should be according to the clock. The
+    moves that should have ended since the previous frame, or all the queued 
+    ones when jumping to the end, are applied at once without being 
+    drawn. The moves are dropped from the actions queue as soon as they are
+    over."""
+    global state
+    now = time.time()
+    while sched.in_progress():
+        angle, complete = sched.step(now)
+        if complete:
+            cube.advance(90.)
+            state = kb.compile(actions.popleft()).apply(state)
+            start_turn(now)
+        else:
+            cube.advance(angle)
+            break
+    if not actions:
+        sched.skipping = False
 
 
 def renderscene():
-    """This function litterally prints the scene."""
+    """This function litterally prints the scene. It is only called when a 
+    frame has been asked for: while moves are animated, when the camera moves
+    or when the window changes."""
     global xrot, yrot
-    global X, Y, Z
-    global quater
-    global rotx, roty, rotz
-    global maxx, maxy, maxz
     global mesg1
     global mesg2
+    start = time.time()
     glClear(GL_COLOR_BUFFER_BIT|GL_DEPTH_BUFFER_BIT)
     glPushMatrix()       
-    indic = -1
-    for i in range(-1,2,1):
-        for j in range(-1,2,1):
-            for k in range(-1,2,1):
-                if (i==j==k==0)==False:
-                    indic = indic + 1       
-              
-                    if rotx[indic]!=maxx[indic]:
-                        speed = find_dir(rotx[indic],maxx[indic])
-                        rotx[indic]=rotx[indic]+speed
-                        update_cur_mov()
-                        quater[indic]=quat.quaternion(X[indic], angl=speed)*quater[indic]
-                        Y[indic]=np.transpose(utl.Rq(speed*np.pi/180.,X[indic])*np.transpose(np.matrix(Y[indic])))
-                        Z[indic]=np.transpose(utl.Rq(speed*np.pi/180.,X[indic])*np.transpose(np.matrix(Z[indic])))
-                  
-                    if roty[indic]!=maxy[indic]:
-                        speed = find_dir(roty[indic],maxy[indic])
-                        roty[indic]=roty[indic]+speed
-                        update_cur_mov()
-                        quater[indic]=quat.quaternion(Y[indic], angl=speed)*quater[indic]
-                        X[indic]=np.transpose(utl.Rq(speed*np.pi/180.,Y[indic])*np.transpose(np.matrix(X[indic])))
-                        Z[indic]=np.transpose(utl.Rq(speed*np.pi/180.,Y[indic])*np.transpose(np.matrix(Z[indic])))
-
-                    if rotz[indic]!=maxz[indic]:
-                        speed = find_dir(rotz[indic],maxz[indic])
-                        rotz[indic]=rotz[indic]+speed
-                        update_cur_mov()
-                        quater[indic]=quat.quaternion(Z[indic], angl=speed)*quater[indic]
-                        Y[indic]=np.transpose(utl.Rq(speed*np.pi/180.,Z[indic])*np.transpose(np.matrix(Y[indic])))
-                        X[indic]=np.transpose(utl.Rq(speed*np.pi/180.,Z[indic])*np.transpose(np.matrix(X[indic])))
+    animate()
     
-                    glLoadIdentity()
-                    
-                    rotation_x = quat.quaternion([1.,0.,0.], angl=-xrot)
-                    rotation_y = quat.quaternion([0.,1.,0.], angl=-yrot)
-                    glMultMatrixf(rotation_x.matrix)
-                    glMultMatrixf(rotation_y.matrix)
-                    glMultMatrixf((quater[indic]).matrix)
-                    glTranslatef(i*0.5,j*0.5,k*0.5)
-                    trace(i*0.5, j*0.5, k*0.5)     
+    rotation_x = quat.quaternion([1.,0.,0.], angl=-xrot)
+    rotation_y = quat.quaternion([0.,1.,0.], angl=-yrot)
+    # glMultMatrixf reads the arrays column by column, multiplying the 
+    # matrices in reverse order gives the same model view matrices as calling 
+    # it successively for the camera rotations and the cubie rotation
+    camera = np.dot(rotation_y.matrix, rotation_x.matrix)
+    models = np.dot(cube.quater.matrices(), camera)
+    for indic in range(26):
+        glLoadMatrixf(models[indic])
+        draw_cubie(indic, centres[indic])
     glLoadIdentity()       
     glColor3ub(0, 0, 100)
     glRasterPos2f(-1.15, -1.5)
@@ -379,8 +250,9 @@ def renderscene():
     glRasterPos2f(-1.35, -1.75)
     glutBitmapString(GLUT_BITMAP_HELVETICA_18, mesg5) 
     glPopMatrix()
+    glFinish()
+    frame_times[retained].append(time.time() - start)
     glutSwapBuffers()
-    glutPostRedisplay()
 
 
 def init():
@@ -399,6 +271,8 @@ def init():
     glMaterialfv(GL_FRONT, GL_SPECULAR, specref)
     glMateriali(GL_FRONT, GL_SHININESS, 128)
     glColor3ub(230,100,100)
+    global cubie_lists
+    cubie_lists = compile_cubies()
 
 
 def specialkeys(key, x, y):
@@ -417,126 +291,150 @@ def specialkeys(key, x, y):
 
 
 def sequence():
-    """This function is meant to be continiously called by OpenGL. It monitors 
-    the moves. If the global variable cur_mov equals the length of the actions 
-    list, also a global variable, this means that all the planned moves have 
-    been executed, thus sequence just passes. If cur_mov does not equal the 
-    length of the actions list, then the function manages the next move."""
-    global cur_mov
-    global actions
+    """This function is called by OpenGL when idle, as long as there are moves
+    to animate. It monitors the moves. If the actions queue, a global 
+    variable, is empty, this means that all the planned moves have been 
+    executed, thus sequence unregisters itself until the next call to wake. 
+    Otherwise the function manages the next move and asks for a new frame.
+    
+    It also appends to the actions queue the moves found by the solver 
+    thread, if any, as soon as they arrive."""
     global mesg1
     global mesg2
-    if cur_mov>=len(actions):
-        mesg1 = ""
+    poll_solutions()
+    if not actions and not sched.in_progress():
+        if solver is None:
+            mesg1 = ""
         mesg2 = ""
-        pass
+        glutIdleFunc(None)
     else:
-        make_a_move(actions[cur_mov])
-        mesg2 = "{0} moves remaining".format(len(actions)-cur_mov)
+        start_turn(time.time())
+        mesg2 = "{0} moves remaining (x{1:g})".format(queue_depth(), 
+                                                      sched.rate)
     glutPostRedisplay()        
+
+
+def wake():
+    """Registers sequence as the idle function, so that the frames are 
+    produced again until all the planned moves are executed."""
+    glutIdleFunc(sequence)
+    glutPostRedisplay()
+
+
+def watch_solver(value = 0):
+    """Checks, every 50 ms while the solver thread is running, whether it has
+    found new moves, without keeping the idle function registered. Nothing is
+    redrawn while the solver finds nothing."""
+    n = queue_depth()
+    text = mesg1
+    poll_solutions()
+    if queue_depth() > n or solver is None:
+        wake()
+    elif mesg1 != text:
+        glutPostRedisplay()
+    if solver is not None:
+        glutTimerFunc(50, watch_solver, 0)
+
+
+def solve_worker(state, out):
+    """Solves the cube from state in a background thread, putting in the out 
+    queue the moves as soon as they are found and None once it is over."""
+    for seq in kb.solve_iter(state, macros = True):
+        out.put(seq)
+    out.put(None)
+
+
+def start_solver():
+    """Starts solving, in a background thread, the cube as it will be once all
+    the planned moves are executed."""
+    global solver
+    global found
+    global mesg1
+    if solver is not None:
+        mesg1 = "still solving..."
+        return
+    found = 0
+    solver = threading.Thread(target = solve_worker, 
+                              args = (kb.compile(actions).apply(state), 
+                                      solutions))
+    solver.daemon = True
+    solver.start()
+    mesg1 = "solving..."
+    glutTimerFunc(50, watch_solver, 0)
+
+
+def poll_solutions():
+    """Appends to the actions queue the moves found by the solver thread 
+    since the last call. Once the resolution is over, the moves the user 
+    asked for in the meantime are appended as well."""
+    global solver
+    global found
+    global mesg1
+    while solver is not None:
+        try:
+            seq = solutions.get_nowait()
+        except Queue.Empty:
+            break
+        if seq is None:
+            solver = None
+            enqueue(pending)
+            pending.clear()
+            mesg1 = "I found the solution!..."
+        else:
+            enqueue(seq)
+            found = found + len(seq)
+            mesg1 = "solving... {0} moves found".format(found)
     
 
 def make_a_move(key):
     """Updates the global parameters. This will start the moving process."""
-    global xrot, yrot
-    global rotx, roty, rotz
-    global maxx, maxy, maxz
-    global Ma, Mb, Mc, Md, Me, Mf
-    global A, B, C, D, E, F, Vpos, pos    
-    
-    if key == "F":
-        if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-            pos = np.asarray(np.transpose(Vpos))[0]
-            pos = np.array([int(l) for l in pos])
-            Vpos = (Ma)**(-1)*Vpos
-            maxx[pos[A]] = (maxx[pos[A]] - 90)
-    if key == "f":
-        if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-            pos = np.asarray(np.transpose(Vpos))[0]
-            pos = np.array([int(l) for l in pos])
-            Vpos = Ma*Vpos
-            maxx[pos[A]] = (maxx[pos[A]] + 90)
-    if key == "D":
-        if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-            pos = np.asarray(np.transpose(Vpos))[0] 
-            pos = np.array([int(l) for l in pos])
-            Vpos = (Mc)**(-1)*Vpos
-            maxy[pos[C]] = (maxy[pos[C]] - 90)
-    if key == "d":
-        if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-            pos = np.asarray(np.transpose(Vpos))[0] 
-            pos = np.array([int(l) for l in pos])
-            Vpos = Mc*Vpos
-            maxy[pos[C]] = (maxy[pos[C]] + 90)
-    if key == "l":
-        if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-            pos = np.asarray(np.transpose(Vpos))[0]
-            pos = np.array([int(l) for l in pos])
-            Vpos = Me*Vpos
-            maxz[pos[E]] = (maxz[pos[E]] + 90)
-    if key == "L":
-        if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-            pos = np.asarray(np.transpose(Vpos))[0]
-            pos = np.array([int(l) for l in pos])
-            Vpos = (Me)**(-1)*Vpos
-            maxz[pos[E]] = (maxz[pos[E]] - 90)
-    if key == "B":
-        if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-            pos = np.asarray(np.transpose(Vpos))[0]
-            pos = np.array([int(l) for l in pos])
-            Vpos = Mb*Vpos
-            maxx[pos[B]] = (maxx[pos[B]] + 90)
-    if key == "b":
-        if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-            pos = np.asarray(np.transpose(Vpos))[0]
-            pos = np.array([int(l) for l in pos])
-            Vpos = (Mb)**(-1)*Vpos
-            maxx[pos[B]] = (maxx[pos[B]] - 90)
-    if key == "U":
-        if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-            pos = np.asarray(np.transpose(Vpos))[0]
-            pos = np.array([int(l) for l in pos])
-            Vpos = Md*Vpos
-            maxy[pos[D]] = (maxy[pos[D]] + 90)
-    if key == "u":
-        if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-            pos = np.asarray(np.transpose(Vpos))[0]
-            pos = np.array([int(l) for l in pos])
-            Vpos = (Md)**(-1)*Vpos
-            maxy[pos[D]] = (maxy[pos[D]] - 90)
-    if key == "R":
-        if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-            pos = np.asarray(np.transpose(Vpos))[0]
-            pos = np.array([int(l) for l in pos])
-            Vpos = Mf*Vpos
-            maxz[pos[F]] = (maxz[pos[F]] + 90)
-    if key == "r":
-        if (rotx==maxx).all()&(roty==maxy).all()&(rotz==maxz).all():
-            pos = np.asarray(np.transpose(Vpos))[0]
-            pos = np.array([int(l) for l in pos])
-            Vpos = (Mf)**(-1)*Vpos
-            maxz[pos[F]] = (maxz[pos[F]] - 90) 
-
-            
+    cube.make_a_move(key)
+
 
 def keyboard(key, x, y):
     """When the user press keyboard keys (except arrrow keys), this function 
-    updates accordingly the actions global list"""
-    global actions
+    updates accordingly the actions global queue. While the solver is 
+    running the moves are put aside and executed once the solution is 
+    found."""
     global mesg1
     
     if key == chr(27) or key == "q":
         sys.exit()
     if key in ["F", "f", "B", "b", "R", "r", "U", "u", "L", "l", "D", "d" ]:
-        actions = actions + [key]
+        if solver is None:
+            enqueue([key])
+        else:
+            pending.append(key)
     if key == "a":
-        actions = actions + kb.rand_move(20)
-        mesg1 = "randomly moving...."
+        if solver is None:
+            enqueue(kb.rand_move(20))
+            mesg1 = "randomly moving...."
+        else:
+            pending.extend(kb.rand_move(20))
     if key == "s":
-        state = kb.move_list_to_state(actions)
-        seq = kb.solve(state)
-        actions = actions + seq
-        mesg1 = "I found the solution!..."
+        start_solver()
+    if key == "m":
+        toggle_retained()
+    if key == "+":
+        sched.set_rate(min(64., 2.*sched.rate), time.time())
+    if key == "-":
+        sched.set_rate(max(1./8, sched.rate/2.), time.time())
+    if key == "j":
+        sched.skipping = True
+    wake()
+
+
+def toggle_retained():
+    """Switches between the display list and the immediate mode renderers, 
+    printing the mean frame time measured with the one in use so far."""
+    global retained
+    times = frame_times[retained]
+    if len(times) > 0:
+        print "{0} mode: {1:.2f} ms per frame (mean over {2} frames)".format(
+            "retained" if retained else "immediate", 
+            1000.*sum(times)/len(times), len(times))
+    retained = not retained
+    times.clear()
 
 
 def reshape( w, h):
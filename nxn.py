@@ -0,0 +1,536 @@
+# -*- coding: utf-8 -*-
+"""
+Rubik's cubes of any size N, with array-backed states.
+
+The state of a NxN cube is the array of uint8 of the colours (face indices,
+in the order U, R, F, D, L, B) of its 6*N*N stickers, each face being read
+row by row as in the 54 facelet format of the facelet module, which is the
+case N = 3. A move is a permutation of the stickers held as an integer
+array: it sends the state Y to Y[perm], so that applying a move costs a
+single gather whatever N, instead of a product of matrices whose size grows
+as N**4.
+
+The layers of a cube are turned clockwise (respectively counterclockwise) as
+seen from the face they are named after: "R" (resp. "r") for the outer
+layer, "2R" (resp. "2r") for the next one, and so on. The outer layers turn
+like the fundamental moves of Kube.
+
+The solver reduces the cube to a 3x3 one: the corners, and the middle edges
+and centres when N is odd, are solved by Kube, then each orbit of wing edges
+and of centres is solved by conjugated commutators (utilities.conjugate and
+utilities.commutator) which cycle 3 of its pieces and leave all the others
+in place.
+
+Classes
+-------
+
+cube_move: formalizes moves of the NxN cube as permutations of the stickers
+
+functions
+---------
+
+stickers: returns the positions and normals of the stickers
+
+layer_names: returns the names of the layer quarter turns
+
+move_tables: returns the permutations of the layer quarter turns
+
+solved_state: returns the state of the solved cube
+
+to_move: returns the move object of a list of names
+
+apply: applies a list of moves to one or many states
+
+rand_move: returns a list of random layer moves
+
+orbits: returns the orbits of the pieces
+
+solve: solves the cube from a given state
+
+Examples
+--------
+
+>>> import nxn
+>>> actions = nxn.rand_move(5, 60)
+>>> state = nxn.apply(nxn.solved_state(5), actions, 5)
+>>> solution = nxn.solve(state, 5)
+
+"""
+
+import random as rd
+
+import numpy as np
+
+import utilities as utl
+import batch
+import facelet
+
+faces = "URFDLB"
+
+# normal of each face and directions of the columns and of the rows of its
+# stickers, as seen from the outside
+frames = {'U': ((0, 1, 0), (1, 0, 0), (0, 0, 1)),
+          'R': ((1, 0, 0), (0, 0, -1), (0, -1, 0)),
+          'F': ((0, 0, 1), (1, 0, 0), (0, -1, 0)),
+          'D': ((0, -1, 0), (1, 0, 0), (0, 0, -1)),
+          'L': ((-1, 0, 0), (0, 0, 1), (0, -1, 0)),
+          'B': ((0, 0, -1), (-1, 0, 0), (0, -1, 0))}
+
+# outer moves used to conjugate the slices of the commutators
+outer = ["U", "u", "R", "r", "F", "f", "D", "d", "L", "l", "B", "b"]
+
+# cached tables of each size
+_tables = {}
+_orbits = {}
+_macros = {}
+_setup_tables = {}
+
+# greatest number of turns of the setup moves of the commutators
+max_depth = 4
+
+
+def stickers(n):
+    """Returns the 6n^2x3 arrays of integers of the positions of the centres of
+    the cubies which the stickers belong to, in units of half a cubie from
+    the centre of the cube, and of the normals of the stickers."""
+    pos, nor = [], []
+    for f in faces:
+        normal, col, row = [np.array(v) for v in frames[f]]
+        for r in range(n):
+            for c in range(n):
+                pos.append((n - 1)*normal + (2*c - n + 1)*col +
+                           (2*r - n + 1)*row)
+                nor.append(normal)
+    return np.array(pos), np.array(nor)
+
+
+def layer_names(n):
+    """Returns the list of the names of the clockwise quarter turns of the n
+    layers along each axis."""
+    res = []
+    for f in faces:
+        # the layers of an axis are named after R, U and F up to the middle
+        # and after L, D and B beyond it
+        deep = (n - 1)//2 if f in "URF" else n//2 - 1
+        res += [(str(d + 1) if d > 0 else "") + f for d in range(deep + 1)]
+    return res
+
+
+def _inverse_name(name):
+    return name[:-1] + name[-1].swapcase()
+
+
+def move_tables(n):
+    """Returns the dict from the names of the layer quarter turns of the nxn
+    cube, clockwise and counterclockwise, to their permutations of the
+    stickers."""
+    if n in _tables:
+        return _tables[n]
+    pos, nor = stickers(n)
+    where = {}
+    for i in range(len(pos)):
+        where[tuple(pos[i]) + tuple(nor[i])] = i
+    res = {}
+    for name in layer_names(n):
+        f = name[-1]
+        depth = int(name[:-1]) - 1 if len(name) > 1 else 0
+        normal = np.array(frames[f][0])
+        # clockwise quarter turn as seen from the face
+        K = np.array([[0, -normal[2], normal[1]], [normal[2], 0, -normal[0]],
+                      [-normal[1], normal[0], 0]])
+        rot = np.eye(3, dtype = int) - K + np.dot(K, K)
+        perm = np.arange(len(pos))
+        for i in np.nonzero(np.dot(pos, normal) == n - 1 - 2*depth)[0]:
+            j = where[tuple(np.dot(rot, pos[i])) + tuple(np.dot(rot, nor[i]))]
+            perm[j] = i
+        res[name] = perm
+        res[_inverse_name(name)] = np.argsort(perm)
+    _tables[n] = res
+    return res
+
+
+def solved_state(n):
+    """Returns the array of uint8 of the colours of the stickers of the solved
+    nxn cube."""
+    return np.repeat(np.arange(6, dtype = np.uint8), n*n)
+
+
+class cube_move():
+    """A cube_move object formalizes a move of the NxN cube as a permutation
+    of its 6*N*N stickers. It multiplies, inverts and decomposes into layer
+    moves like the move objects of utilities, so that utilities.conjugate and
+    utilities.commutator apply to it.
+
+    Attributes
+    ----------
+
+    n : int, size of the cube
+
+    perm : array of int, the move sends the state Y to Y[perm]
+
+    decompo : list of str, names of the layer moves of the move
+
+    """
+    def __init__(self, n, perm = None, seq = None):
+        self.n = n
+        if perm is None:
+            perm = np.arange(6*n*n)
+        self.perm = perm
+        self.decompo = list(seq or [])
+
+    def __pow__(self, expo):
+        if not (isinstance(expo, int) and expo > -2):
+            raise ValueError("expo has to be an integer greater or equal \
+            to -1")
+        if expo == -1:
+            return cube_move(self.n, np.argsort(self.perm),
+                             [_inverse_name(a) for a in self.decompo[::-1]])
+        res = cube_move(self.n)
+        for i in range(expo):
+            res = self*res
+        return res
+
+    def __mul__(self, other):
+        return cube_move(self.n, other.perm[self.perm],
+                         other.decompo + self.decompo)
+
+    def moved(self):
+        """Returns the indices of the stickers moved by the move."""
+        return np.nonzero(self.perm != np.arange(len(self.perm)))[0]
+
+
+def to_move(n, actions):
+    """Returns the cube_move object of a list of names of layer moves of the
+    nxn cube."""
+    tables = move_tables(n)
+    res = cube_move(n)
+    for a in actions:
+        res = cube_move(n, tables[a], [a])*res
+    return res
+
+
+def apply(states, actions, n):
+    """Returns the states obtained by applying a list of layer moves to the
+    state, or to each row of the array of states, of nxn cubes."""
+    tables = move_tables(n)
+    states = np.asarray(states)
+    for a in actions:
+        states = np.take(states, tables[a], axis = -1)
+    return states
+
+
+def rand_move(n, num_move = 200):
+    """Returns a list of num_move names of layer moves of the nxn cube
+    randomly picked."""
+    names = sorted(move_tables(n))
+    return [rd.choice(names) for i in range(num_move)]
+
+
+def orbits(n):
+    """Returns the orbits of the pieces of the nxn cube under the layer moves,
+    as a list of (kind, pieces) where kind is "corner", "edge", "wing",
+    "centre" or "fixed" (centres of the middle layers of an odd cube) and
+    pieces the list of the arrays of the indices of the stickers of its
+    pieces."""
+    if n in _orbits:
+        return _orbits[n]
+    pos, nor = stickers(n)
+    cubies = {}
+    for i in range(len(pos)):
+        cubies.setdefault(tuple(pos[i]), []).append(i)
+    keys = sorted(cubies, key = lambda q: min(cubies[q]))
+    cubie = np.zeros(len(pos), dtype = int)
+    for k, q in enumerate(keys):
+        cubie[cubies[q]] = k
+    # union of the cubies swapped by the moves
+    parent = range(len(keys))
+
+    def root(k):
+        while parent[k] != k:
+            k = parent[k]
+        return k
+    for perm in move_tables(n).values():
+        for a, b in set(zip(cubie, cubie[perm])):
+            ra, rb = root(a), root(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+    groups = {}
+    for k in range(len(keys)):
+        groups.setdefault(root(k), []).append(k)
+    res = []
+    for r in sorted(groups):
+        q = np.abs(np.array(keys[groups[r][0]]))
+        outside = np.sum(q == n - 1)
+        if outside == 3:
+            kind = "corner"
+        elif outside == 2:
+            kind = "edge" if np.sum(q == 0) == 1 else "wing"
+        else:
+            kind = "fixed" if np.sum(q == 0) == 2 else "centre"
+        res.append((kind, [np.array(sorted(cubies[keys[k]]))
+                           for k in groups[r]]))
+    _orbits[n] = res
+    return res
+
+
+def _destinations(n, pieces, perm):
+    """Returns the array of the indices of the pieces to which a move sends
+    each piece of an orbit."""
+    piece = {}
+    for k, p in enumerate(pieces):
+        piece[p[0]] = k
+    inv = np.argsort(perm)
+    res = np.empty(len(pieces), dtype = np.int8)
+    for k, p in enumerate(pieces):
+        res[k] = [piece[s] for s in inv[p] if s in piece][0]
+    return res
+
+
+def _macro(n, o):
+    """Returns a commutator of a layer quarter turn and of a conjugated layer
+    quarter turn which cycles 3 pieces of the orbit o and leaves all the
+    other stickers in place, and its 3 pieces in the order of the cycle."""
+    if (n, o) in _macros:
+        return _macros[(n, o)]
+    kind, pieces = orbits(n)[o]
+    inside = set(np.concatenate(pieces))
+    tables = move_tables(n)
+    names = sorted(tables)
+    for a in names:
+        A = cube_move(n, tables[a], [a])
+        for x in outer:
+            X = cube_move(n, tables[x], [x])
+            for y in names:
+                B = utl.conjugate(cube_move(n, tables[y], [y]), X)
+                C = utl.commutator(A, B)
+                moved = C.moved()
+                if len(moved) == 0 or not set(moved) <= inside:
+                    continue
+                dest = _destinations(n, pieces, C.perm)
+                cycle = np.nonzero(dest != np.arange(len(pieces)))[0]
+                if len(cycle) == 3:
+                    s0 = cycle[0]
+                    res = (C, [s0, dest[s0], dest[dest[s0]]])
+                    _macros[(n, o)] = res
+                    return res
+    raise ValueError("no 3-cycle found for the orbit {0}".format(o))
+
+
+def _hash(rows, weights):
+    """Returns the 64 bits hashes of the rows of an array."""
+    res = np.zeros(len(rows), dtype = np.uint64)
+    for c in range(rows.shape[1]):
+        res += rows[:, c].astype(np.uint64)*weights[c]
+    return res
+
+
+def _setups(n, o, depth):
+    """Returns the setup moves of at most depth layer quarter or half turns,
+    the shortest first and without duplicates, as the table of the
+    destinations of the pieces of the orbit o by each of them and the table
+    of its inverse. The levels already built are kept, and extended when a
+    greater depth is asked for."""
+    if (n, o) not in _setup_tables:
+        kind, pieces = orbits(n)[o]
+        tables = move_tables(n)
+        turns = [[a] for a in sorted(tables)]
+        turns += [[a, a] for a in layer_names(n)]
+        gens = np.array([_destinations(n, pieces, to_move(n, t).perm)
+                         for t in turns])
+        start = np.arange(len(pieces), dtype = np.int8)[np.newaxis, :]
+        weights = np.random.RandomState(0).randint(1, 2**62, len(pieces))
+        _setup_tables[(n, o)] = {'turns': turns, 'gens': gens, 
+                                 'weights': weights.astype(np.uint64),
+                                 'dests': start, 'inverse': start,
+                                 'parent': np.array([-1]), 
+                                 'turn': np.array([-1]), 'level': 0,
+                                 'seen': np.zeros(1, dtype = np.uint64),
+                                 'depth': 0}
+        t = _setup_tables[(n, o)]
+        t['seen'] = _hash(start, t['weights'])
+    t = _setup_tables[(n, o)]
+    while t['depth'] < depth:
+        level = t['dests'][t['level']:]
+        new = t['gens'][:, level].reshape((-1, level.shape[1]))
+        parent = np.tile(np.arange(t['level'], len(t['dests'])), 
+                         len(t['gens']))
+        turn = np.repeat(np.arange(len(t['gens'])), len(level))
+        # keep the first sequence of each new effect
+        keys = _hash(new, t['weights'])
+        keys, first = np.unique(keys, return_index = True)
+        fresh = ~np.in1d(keys, t['seen'])
+        first = np.sort(first[fresh])
+        t['seen'] = np.concatenate([t['seen'], keys[fresh]])
+        t['level'] = len(t['dests'])
+        t['dests'] = np.concatenate([t['dests'], new[first]])
+        inverse = np.empty_like(new[first])
+        inverse[np.arange(len(first))[:, np.newaxis], new[first]] = \
+            np.arange(new.shape[1], dtype = np.int8)
+        t['inverse'] = np.concatenate([t['inverse'], inverse])
+        t['parent'] = np.concatenate([t['parent'], parent[first]])
+        t['turn'] = np.concatenate([t['turn'], turn[first]])
+        t['depth'] += 1
+    return t['dests'], t['inverse']
+
+
+def _setup_names(n, o, k):
+    """Returns the list of the names of the layer moves of the setup k of the
+    orbit o."""
+    t = _setup_tables[(n, o)]
+    res = []
+    while t['parent'][k] >= 0:
+        res = t['turns'][t['turn'][k]] + res
+        k = t['parent'][k]
+    return res
+
+
+def _wing_pieces(n, pieces, state):
+    """Returns the array of the home slots of the wings in the slots of a
+    wing orbit. A wing cannot be flipped in place, so that its home is given
+    by its two colours and by the handedness of the way it shows them, which
+    no turn changes."""
+    pos, nor = stickers(n)
+    home = {}
+    for k, p in enumerate(pieces):
+        a, b = p
+        hand = np.sign(np.linalg.det([nor[a], nor[b], pos[a]]))
+        home[(a//(n*n), b//(n*n), hand)] = k
+        home[(b//(n*n), a//(n*n), -hand)] = k
+    res = np.empty(len(pieces), dtype = int)
+    for k, p in enumerate(pieces):
+        a, b = p
+        ca, cb = state[a], state[b]
+        hand = np.sign(np.linalg.det([nor[a], nor[b], pos[a]]))
+        res[k] = home[(ca, cb, hand)]
+    return res
+
+
+def _parity(perm):
+    """Returns the parity (0 for even, 1 for odd) of a permutation."""
+    seen = np.zeros(len(perm), dtype = bool)
+    res = 0
+    for i in range(len(perm)):
+        if not seen[i]:
+            j, length = i, 0
+            while not seen[j]:
+                seen[j] = True
+                j = perm[j]
+                length += 1
+            res ^= (length - 1) % 2
+    return res
+
+
+def _skeleton(n, state):
+    """Returns the 54 facelets of the corners, and when n is odd of the middle
+    edges and centres, of the nxn cube, the other stickers being the ones of
+    the solved cube."""
+    res = facelet.solved.copy()
+    for f in range(6):
+        for r in range(3):
+            for c in range(3):
+                rr = [0, (n - 1)//2, n - 1][r]
+                cc = [0, (n - 1)//2, n - 1][c]
+                if n % 2 == 1 or (r != 1 and c != 1):
+                    res[9*f + 3*r + c] = state[f*n*n + rr*n + cc]
+    return res
+
+
+def _solve_orbit(n, o, state):
+    """Yields the conjugated commutators which solve the pieces of the orbit
+    o, one at a time, the slots being solved in order."""
+    kind, pieces = orbits(n)[o]
+    C, cycle = _macro(n, o)
+    colour = np.array([p[0]//(n*n) for p in pieces])
+    first = np.array([p[0] for p in pieces])
+    for i in range(len(pieces)):
+        if kind == "wing":
+            at = _wing_pieces(n, pieces, state)
+            want = at == i
+            done = at[i] == i
+        else:
+            want = state[first] == colour[i]
+            done = want[i]
+        if done:
+            continue
+        free = np.arange(len(pieces)) > i
+        want &= free
+        found = []
+        depth = 2
+        # the setups are looked for among deeper and deeper moves
+        while len(found) == 0 and depth <= max_depth:
+            dests, inverse = _setups(n, o, depth)
+            # the piece to solve is sent by the setup where the macro, or its
+            # inverse, brings it to the slot of the setup of the slot i
+            for way, cyc in [(1, cycle), (-1, cycle[::-1])]:
+                ok = np.zeros(len(dests), dtype = bool)
+                for a in range(3):
+                    ok = ok | ((dests[:, i] == cyc[(a + 1) % 3]) &
+                               want[inverse[:, cyc[a]]] & 
+                               free[inverse[:, cyc[(a + 2) % 3]]])
+                found = np.nonzero(ok)[0]
+                if len(found) > 0:
+                    break
+            depth += 1
+        if len(found) == 0:
+            raise ValueError("no setup found for the piece {0} of the orbit "
+                             "{1}".format(i, o))
+        H = to_move(n, _setup_names(n, o, found[0]))
+        next_move = utl.conjugate(C**way, H**(-1))
+        state = state[next_move.perm]
+        yield next_move
+
+
+def solve(state, n):
+    """Solves the nxn cube from a given state and returns the list of the
+    names of the layer moves of the solution.
+
+    Parameters
+    ----------
+
+    state: array of uint8, colours of the 6*n*n stickers of the cube
+
+    n: int, size of the cube
+
+    """
+    import Kube as kb
+    state = np.array(state, dtype = np.uint8)
+    res = []
+
+    def play(actions):
+        res.extend(actions)
+        return apply(state, actions, n)
+
+    if n % 2 == 1 and n > 1:
+        # bring the centres of the middle layers back in place
+        middle = str((n + 1)//2)
+        slices = [[]] + [[middle + f] for f in "URFurf"]
+        # any of the 24 orientations is at most 3 quarter turns away
+        slices = [a + b + c for a in slices for b in slices for c in slices]
+        centres = [f*n*n + (n*n)//2 for f in range(6)]
+        for s in slices:
+            if (apply(state, s, n)[centres] == np.arange(6)).all():
+                state = play(s)
+                break
+    if n > 1:
+        # the corners, and the middle edges of an odd cube, as a 3x3 cube
+        Y = facelet.to_states(_skeleton(n, state)[np.newaxis, :], False)
+        if n % 2 == 0 and batch.parity(Y[:, :8])[0]:
+            # the edges of the skeleton of an even cube are solved, a quarter
+            # turn makes the permutation of its corners even as well
+            state = play(["U"])
+            Y = facelet.to_states(_skeleton(n, state)[np.newaxis, :], False)
+        Y = Y[0]
+        Y = np.transpose(np.matrix(Y.astype(float)))
+        state = play(sum(kb.solve_iter(Y), []))
+    for o, (kind, pieces) in enumerate(orbits(n)):
+        if kind == "wing" and _parity(_wing_pieces(n, pieces, state)):
+            # a quarter turn of a slice holding wings of the orbit makes
+            # their permutation even, so that 3-cycles can solve them
+            k = np.abs(stickers(n)[0][pieces[0][0]])
+            depth = (n - 1 - np.min(k))//2
+            state = play([str(depth + 1) + "R"])
+    for o, (kind, pieces) in enumerate(orbits(n)):
+        if kind in ("wing", "centre"):
+            for m in _solve_orbit(n, o, state):
+                state = play(m.decompo)
+    return res
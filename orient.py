@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Resolution of the Rubik's cube in the best of its 24 orientations.
+
+Description
+-----------
+
+The moves found by the solver, which places the cubies one cubicle after the
+other, depend on how the cube is held. A whole cube rotation relabels the
+state: the stickers move to the rotated positions and the colours are
+renamed after the faces they now lie on, so that the rotated cube is again a
+state of the 68 entries format. It is solved like any other, and each move of
+its solution is mapped back to the face of the original cube which it turns,
+a clockwise quarter turn remaining clockwise.
+
+The 24 variants are solved by a pool of threads, in the order of the
+rotations starting with the identity, and the cheapest solution found
+before the time cap is returned. The variants still being solved when the
+cap is reached give up between two macros, except the identity which is
+always solved, so that the result is never worse than the one of
+Kube.solve.
+
+functions
+---------
+
+rotations: returns the 24 rotation matrices of the cube
+
+rotate_states: returns the states of the cubes rotated by a rotation
+
+rotate_moves: maps a list of chars from a rotated frame to the original one
+
+solve: solves the Rubik's cube in its best orientation
+
+Examples
+--------
+
+>>> import orient
+>>> import Kube as kb
+>>> state = kb.move_list_to_state(kb.rand_move(30))
+>>> actions = orient.solve(state, threads = 4, time_cap = 5.)
+
+"""
+
+import time
+import itertools
+
+import numpy as np
+
+import nxn
+import facelet
+import Kube as kb
+
+
+def rotations():
+    """Returns the 24x3x3 array of the integer rotation matrices of the
+    cube, the first one being the identity."""
+    res = []
+    for p in itertools.permutations(range(3)):
+        for s in itertools.product([1, -1], repeat = 3):
+            m = np.zeros((3, 3), dtype = int)
+            m[range(3), p] = s
+            if round(np.linalg.det(m)) == 1:
+                res.append(m)
+    return np.array(res)
+
+
+# normals of the faces, in the order of facelet.faces
+normals = np.array([nxn.frames[f][0] for f in facelet.faces])
+
+
+def _tables():
+    """Returns, for each rotation, the gather of the 54 stickers, the new
+    names of the colours and the old names of the faces."""
+    pos, nor = nxn.stickers(3)
+    where = dict(((tuple(p), tuple(n)), i) for i, (p, n) in
+                 enumerate(zip(pos, nor)))
+    face = dict((tuple(n), i) for i, n in enumerate(normals))
+    gathers, colours, names = [], [], []
+    for m in rotations():
+        # the sticker at the rotated position of the sticker i comes from i
+        index = np.empty(54, dtype = np.intp)
+        for i in range(54):
+            index[where[tuple(m.dot(pos[i])), tuple(m.dot(nor[i]))]] = i
+        gathers.append(index)
+        colours.append([face[tuple(m.dot(n))] for n in normals])
+        names.append([facelet.faces[face[tuple(m.T.dot(n))]]
+                      for n in normals])
+    return np.array(gathers), np.array(colours, dtype = np.uint8), names
+
+
+gathers, colours, face_names = _tables()
+
+
+def rotate_states(states, k):
+    """Returns the Nx68 states of the cubes of a Nx68 array of states rotated
+    by the rotation k."""
+    facelets = facelet.from_states(states)
+    return facelet.to_states(colours[k][facelets[:, gathers[k]]],
+                             check = False)
+
+
+def rotate_moves(actions, k):
+    """Returns the list of chars turning, on the original cube, the faces
+    turned by a list of chars on the cube rotated by the rotation k."""
+    res = []
+    for a in actions:
+        name = face_names[k][facelet.faces.index(a.upper())]
+        res.append(name if a.isupper() else name.lower())
+    return res
+
+
+def solve(state, threads = 1, time_cap = None, cost = len):
+    """Solves the Rubik's cube from a given state in each of its 24
+    orientations, and returns the cheapest solution found, as a list of
+    chars turning the faces of the original cube.
+
+    Parameters
+    ----------
+
+    state: array 68x1 matrix representing the state of the Rubik's cube to
+    solve
+
+    threads: (optional) int, number of orientations solved at the same time
+
+    time_cap: (optional) float, time in seconds after which no more
+    orientation is tried, the solutions found so far being compared, the
+    original orientation being always solved
+
+    cost: (optional) function returning the cost of a list of chars, the
+    number of moves by default (see robot.cost_model)
+
+    """
+    deadline = None if time_cap is None else time.time() + time_cap
+    state = np.rint(np.asarray(state, dtype = float)).reshape((1, 68))
+    variants = np.concatenate([rotate_states(state, k) for k in range(24)])
+    found = []
+
+    def late(k):
+        return k > 0 and deadline is not None and time.time() > deadline
+
+    def attempt(k):
+        if late(k):
+            return None
+        Y = np.transpose(np.matrix(variants[k].astype(float)))
+        res = []
+        for seq in kb.solve_iter(Y, macros = True):
+            if late(k):
+                return None
+            res = res + seq
+        res = rotate_moves(res, k)
+        found.append(res)
+        return res
+
+    if threads <= 1:
+        for k in range(24):
+            attempt(k)
+    else:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(threads)
+        try:
+            pool.map(attempt, range(24))
+        finally:
+            pool.close()
+            pool.join()
+    return min(found, key = cost)
@@ -94,4 +94,161 @@ class quaternion():
         y = w1*y2 - x1*z2 + y1*w2 + z1*x2
         z = w1*z2 + x1*y2 - y1*x2 + z1*w2
         
-        return quaternion(np.array([x, y, z]), W = w)
\ No newline at end of file
+        return quaternion(np.array([x, y, z]), W = w)
+
+class QuaternionArray():
+    """An array of N quaternions, stored as a Nx4 array of floats (the scalar 
+    part followed by the vector part), in order to represent and update the 
+    rotations of many objects with a handful of NumPy calls.
+    
+    Examples
+    --------
+    
+    >>> import numpy as np
+    >>> import quaternion as quat
+    >>> Q1 = quat.QuaternionArray.identity(26)
+    >>> Q2 = quat.QuaternionArray.from_axis_angle(np.eye(3), 90.)
+    >>> M = (Q2*Q1[:3]).matrices()
+    
+    Notes
+    -----
+    
+    The conventions are the ones of the quaternion class: angles are in 
+    degrees and the product Q2*Q1 represents the rotation Q1 followed by the
+    rotation Q2.
+    
+    """
+    
+    def __init__(self, q):
+        """Initializes a QuaternionArray object
+        
+        Parameters
+        ----------
+        
+        q: array-like of shape Nx4 (or 4), the scalar part and the vector part
+        of each quaternion
+        
+        """
+        self.q = np.array(q, dtype = float).reshape((-1, 4))
+    
+    
+    @classmethod
+    def identity(cls, n):
+        """Returns n quaternions representing no rotation at all."""
+        q = np.zeros((n, 4))
+        q[:, 0] = 1.
+        return cls(q)
+    
+    
+    @classmethod
+    def from_axis_angle(cls, vect, angl):
+        """Returns the quaternions of the rotations of angles angl about the 
+        unit vectors vect.
+        
+        Parameters
+        ----------
+        
+        vect: array-like of shape Nx3 (or 3), unit vectors about which the 
+        rotations happen
+        
+        angl: float or array-like of N floats, angles of the rotations in 
+        degrees
+        
+        """
+        vect = np.array(vect, dtype = float).reshape((-1, 3))
+        half = np.asarray(angl, dtype = float)/2.*np.pi/180.
+        half = half*np.ones(len(vect))
+        q = np.empty((len(vect), 4))
+        q[:, 0] = np.cos(half)
+        q[:, 1:] = vect*np.sin(half)[:, np.newaxis]
+        return cls(q)
+    
+    
+    def __len__(self):
+        return len(self.q)
+    
+    
+    def __getitem__(self, index):
+        return QuaternionArray(self.q[index])
+    
+    
+    def __setitem__(self, index, other):
+        self.q[index] = other.q
+    
+    
+    def __mul__(self, other):
+        w1, x1, y1, z1 = self.q.T
+        w2, x2, y2, z2 = other.q.T
+        
+        q = np.empty(np.broadcast(w1, w2).shape + (4,))
+        q[:, 0] = w1*w2 - x1*x2 - y1*y2 - z1*z2
+        q[:, 1] = w1*x2 + x1*w2 + y1*z2 - z1*y2
+        q[:, 2] = w1*y2 - x1*z2 + y1*w2 + z1*x2
+        q[:, 3] = w1*z2 + x1*y2 - y1*x2 + z1*w2
+        
+        return QuaternionArray(q)
+    
+    
+    def normalize(self):
+        """Returns the quaternions scaled to unit norm, which prevents the 
+        rounding errors from accumulating over many products."""
+        return QuaternionArray(self.q/np.sqrt((self.q**2).sum(axis = 1))[:, 
+                               np.newaxis])
+    
+    
+    def slerp(self, other, t):
+        """Returns the spherical linear interpolation between these 
+        quaternions (t = 0) and the other ones (t = 1).
+        
+        Parameters
+        ----------
+        
+        other: QuaternionArray of the same length (or of length 1)
+        
+        t: float or array-like of N floats, interpolation parameters
+        
+        """
+        q1 = self.q
+        q2 = other.q*np.ones(q1.shape)
+        cos = (q1*q2).sum(axis = 1)
+        # q and -q represent the same rotation, take the shortest path
+        q2 = np.where((cos < 0)[:, np.newaxis], -q2, q2)
+        cos = np.abs(cos)
+        t = (np.asarray(t, dtype = float)*np.ones(len(q1)))[:, np.newaxis]
+        theta = np.arccos(np.clip(cos, -1., 1.))[:, np.newaxis]
+        sin = np.sin(theta)
+        close = sin[:, 0] < 1e-6
+        sin[close] = 1.
+        w1 = np.where(close[:, np.newaxis], 1. - t, np.sin((1. - t)*theta)/sin)
+        w2 = np.where(close[:, np.newaxis], t, np.sin(t*theta)/sin)
+        return QuaternionArray(w1*q1 + w2*q2).normalize()
+    
+    
+    def matrices(self):
+        """Returns the Nx4x4 array of the rotation matrices, each of them 
+        equal to the matrix attribute of the corresponding quaternion 
+        object."""
+        w, x, y, z = self.q.T
+        res = np.zeros((len(self.q), 4, 4))
+    
+        res[:, 0, 0] = w**2+x**2-y**2-z**2
+        res[:, 1, 1] = w**2-x**2+y**2-z**2
+        res[:, 2, 2] = w**2-x**2-y**2+z**2
+    
+        res[:, 0, 1] = 2*x*y-2*w*z
+        res[:, 0, 2] = 2*x*z+2*w*y
+    
+        res[:, 1, 0] = 2*x*y+2*w*z
+        res[:, 1, 2] = 2*y*z-2*w*x
+    
+        res[:, 2, 0] = 2*x*z-2*w*y
+        res[:, 2, 1] = 2*y*z+2*w*x
+        res[:, 3, 3] = 1.
+        return res
+    
+    
+    def rotate(self, vect):
+        """Returns the Nx3 array of the vectors vect rotated by the 
+        quaternions."""
+        R = self.matrices()[:, :3, :3]
+        return np.einsum('nij,nj->ni', R, np.asarray(vect, dtype = float))
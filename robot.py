@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Execution of the solutions by a robot, whose turns take different times.
+
+Description
+-----------
+
+A robot turning the faces of the cube takes longer for a half turn than for
+a quarter turn, and it may turn two opposite faces at the same time. The cost
+model gives the time of each kind of turn and the part of the time of the
+shorter turn saved when two opposite faces turn together.
+
+A solution, a list of chars naming quarter turns as returned by Kube.solve,
+is first simplified: the consecutive turns of a face, possibly separated by
+turns of the opposite face which commute with them, are merged into a single
+quarter turn ("F" or "f"), half turn ("F2") or nothing. The turns are then
+scheduled in steps, each step holding one turn or two turns of opposite
+faces done at the same time.
+
+Classes
+-------
+
+cost_model: times of the turns of the robot
+
+functions
+---------
+
+simplify: returns the list of the turns of a list of chars
+
+schedule: returns the steps of the execution of a list of chars
+
+to_chars: returns the list of chars of a list of turns
+
+solve: solves the Rubik's cube with the cheapest execution
+
+Examples
+--------
+
+>>> import robot
+>>> import Kube as kb
+>>> model = robot.cost_model(quarter = 1., half = 1.6, parallel = 0.8)
+>>> steps, cost = robot.solve(kb.move_list_to_state(kb.rand_move(20)), model)
+>>> robot.schedule(["F", "B", "F", "R", "L"], model)
+[['F2', 'B'], ['R', 'L']]
+
+"""
+
+import Kube as kb
+
+# faces of the turns, opposite faces being 3 apart
+faces = "FRUBLD"
+
+
+def _face(turn):
+    return faces.index(turn[0].upper())
+
+
+def _opposite(a, b):
+    return (_face(a) - _face(b)) % 6 == 3
+
+
+class cost_model():
+    """Times of the turns of a robot.
+
+    Attributes
+    ----------
+
+    quarter: float, time of a quarter turn
+
+    half: float, time of a half turn
+
+    parallel: float, part of the time of the shorter turn saved when two
+    opposite faces turn at the same time, 1 if they turn fully in parallel
+    and 0 if they do not
+
+    """
+    def __init__(self, quarter = 1., half = 1.5, parallel = 1.):
+        self.quarter = quarter
+        self.half = half
+        self.parallel = parallel
+
+    def turn_cost(self, turn):
+        """Returns the time of a turn ("F", "f" or "F2")."""
+        if turn.endswith("2"):
+            return self.half
+        return self.quarter
+
+    def step_cost(self, step):
+        """Returns the time of a step, a list of one turn or of two turns of
+        opposite faces done at the same time."""
+        costs = [self.turn_cost(t) for t in step]
+        return sum(costs) - (len(costs) - 1)*self.parallel*min(costs)
+
+    def cost(self, actions):
+        """Returns the time of the execution of a list of chars."""
+        return sum([self.step_cost(s) for s in schedule(actions, self)])
+
+
+# quarter turns counted by the model used when none is given
+moves = cost_model(quarter = 1., half = 2., parallel = 0.)
+
+
+def _name(face, amount):
+    return [None, face, face + "2", face.lower()][amount]
+
+
+def simplify(actions):
+    """Returns the list of the turns ("F", "f" or "F2") with the same effect
+    as a list of chars naming quarter turns, the turns of the same face being
+    merged, even across a turn of the opposite face.
+
+    Parameters
+    ----------
+
+    actions: char list, names of consecutive fundamental moves
+
+    """
+    # [face, number of quarter turns clockwise]
+    res = []
+    for a in actions:
+        face, amount = a.upper(), 1 if a.isupper() else 3
+        if res and res[-1][0] == face:
+            i = -1
+        elif (len(res) > 1 and res[-2][0] == face and
+              _opposite(res[-1][0], face)):
+            i = -2
+        else:
+            res.append([face, amount])
+            continue
+        res[i][1] = (res[i][1] + amount) % 4
+        if res[i][1] == 0:
+            del res[i]
+    return [_name(f, k) for f, k in res]
+
+
+def to_chars(turns):
+    """Returns the list of chars naming the quarter turns of a list of turns,
+    a half turn "F2" giving ["F", "F"]."""
+    res = []
+    for t in turns:
+        res = res + (2*[t[0]] if t.endswith("2") else [t])
+    return res
+
+
+def schedule(actions, model = moves):
+    """Returns the steps of the execution of a list of chars, each step being
+    the list of one turn or of two turns of opposite faces done at the same
+    time. Turns of opposite faces are grouped, and half turns are done as two
+    quarter turns, whenever it is cheaper.
+
+    Parameters
+    ----------
+
+    actions: char list, names of consecutive fundamental moves
+
+    model: (optional) cost_model, times of the turns
+
+    """
+    turns = simplify(actions)
+    if model.half > 2*model.quarter:
+        turns = [u for t in turns for u in
+                 ([t[0], t[0]] if t.endswith("2") else [t])]
+    res = []
+    for t in turns:
+        if (res and len(res[-1]) == 1 and _opposite(res[-1][0], t) and
+            model.step_cost(res[-1] + [t]) <
+            model.step_cost(res[-1]) + model.turn_cost(t)):
+            res[-1].append(t)
+        else:
+            res.append([t])
+    return res
+
+
+def solve(state, model = moves, goal = None):
+    """Solves the Rubik's cube from a given state, each search choosing among
+    the shortest moves it finds the cheapest to execute after the moves
+    already found. These choices are made one macro at a time, so that the
+    solution is also compared with the one of Kube.solve_iter, and the
+    cheaper one is kept. Returns the steps of the execution and its time.
+
+    Parameters
+    ----------
+
+    state: array 68x1 matrix representing the state of the Rubik's cube to
+    solve
+
+    model: (optional) cost_model, times of the turns
+
+    goal: (optional) list of int, entries of the state to restore, as
+    returned by Kube.goal
+
+    """
+    res = None
+    for cost in [model.cost, len]:
+        actions = []
+        for seq in kb.solve_iter(state, goal = goal, cost = cost):
+            actions = actions + seq
+        steps = schedule(actions, model)
+        total = sum([model.step_cost(s) for s in steps])
+        if res is None or total < res[1]:
+            res = steps, total
+    return res
@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+"""
+Breadth first distance tables over coordinates of the Rubik's cube.
+
+Description
+-----------
+
+A coordinate is an integer summing up part of the state of the cube, e.g.
+the permutation of the corners or the twists of the corners. The moves of
+Kube.fund_l act on each coordinate through a move table, computed once from
+the gathers of utilities.move.to_index on all the values of the coordinate
+at once. A product of coordinates indexes a table whose entry is the number
+of moves of Kube.fund_l needed to bring the coordinates back to the ones of
+the solved cube, which bounds the length of any solution from below.
+
+The table is built one breadth first layer at a time. The layer being
+expanded is held as a bitset, and the distances are written in a memory
+mapped file, so that both are shared by the processes of a pool expanding
+consecutive chunks of the table in parallel. Each process only writes the
+distance of the new states it reaches, all the processes writing the same
+value, and the bitset of the next layer is rebuilt chunk by chunk from the
+distances. Once most of the states are reached, the layers are expanded
+backwards: the unreached states of each chunk look for a neighbour in the
+bitset of the layer.
+
+functions
+---------
+
+move_table: returns the move table of a coordinate
+
+size: returns the number of entries of a table
+
+entry: returns the entries of a batch of states in a table
+
+build: builds the distance table of a product of coordinates
+
+load: returns the distance table stored in a file
+
+Usage
+-----
+
+Build the table of the corner twists and edge flips with 4 processes::
+
+$ python tables.py corner_twist edge_flip --output twist_flip.dist \\
+--processes 4
+
+and resume it with the same command and --resume if it was stopped.
+
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+
+import numpy as np
+
+import jobs
+import Kube as kb
+
+# gathers of the moves of Kube.fund_l on the 68 entries state
+index = np.array([m.to_index() for m in kb.fund_l])
+
+solved = np.array(range(8) + range(12) + 8*range(3) + 12*range(2),
+                  dtype = np.uint8)
+
+# distance of the entries not reached yet
+unreached = 255
+
+# edges of the middle layer, between the L and R faces
+slice_edges = [1, 2, 9, 10]
+
+factorials = np.cumprod([1] + range(1, 12))
+
+
+def _perm_rank(perms):
+    """Returns the ranks of the rows of perms in the lexicographic order of
+    the permutations."""
+    n = perms.shape[1]
+    res = np.zeros(len(perms), dtype = np.int64)
+    for i in range(n):
+        smaller = (perms[:, i+1:] < perms[:, i:i+1]).sum(axis = 1)
+        res += smaller*factorials[n-1-i]
+    return res
+
+
+def _perm_unrank(ranks, n):
+    """Returns the permutations of n elements of the given ranks."""
+    ranks = np.asarray(ranks, dtype = np.int64)
+    res = np.empty((len(ranks), n), dtype = np.uint8)
+    left = np.ones((len(ranks), n), dtype = bool)
+    for i in range(n):
+        digit = (ranks//factorials[n-1-i]) % (n-i)
+        # the digit-th element not used yet
+        pick = left & (np.cumsum(left, axis = 1) == digit[:, np.newaxis] + 1)
+        res[:, i] = np.argmax(pick, axis = 1)
+        left[np.arange(len(ranks)), res[:, i]] = False
+    return res
+
+
+# ranks of the sets of 4 edge cubicles among 12, by their bit masks
+_masks = np.array([m for m in range(4096) if bin(m).count("1") == 4])
+_mask_rank = np.zeros(4096, dtype = np.int64)
+_mask_rank[_masks] = range(len(_masks))
+
+
+def _corner_perm(states):
+    return _perm_rank(states[:, :8])
+
+
+def _corner_perm_states(coords):
+    res = np.tile(solved, (len(coords), 1))
+    res[:, :8] = _perm_unrank(coords, 8)
+    return res
+
+
+def _corner_twist(states):
+    return (states[:, 20:41:3].astype(np.int64)*3**np.arange(7)).sum(axis = 1)
+
+
+def _corner_twist_states(coords):
+    twist = (np.asarray(coords)[:, np.newaxis]//3**np.arange(7)) % 3
+    twist = np.concatenate([twist, (-twist.sum(axis = 1) % 3)[:, np.newaxis]],
+                           axis = 1)
+    res = np.tile(solved, (len(coords), 1))
+    res[:, 20:44] = ((twist[:, :, np.newaxis] + np.arange(3)) % 3).reshape(
+        (len(coords), 24))
+    return res
+
+
+def _edge_flip(states):
+    return (states[:, 44:66:2].astype(np.int64)*2**np.arange(11)).sum(axis = 1)
+
+
+def _edge_flip_states(coords):
+    flip = (np.asarray(coords)[:, np.newaxis]//2**np.arange(11)) % 2
+    flip = np.concatenate([flip, (flip.sum(axis = 1) % 2)[:, np.newaxis]],
+                          axis = 1)
+    res = np.tile(solved, (len(coords), 1))
+    res[:, 44::2] = flip
+    res[:, 45::2] = 1 - flip
+    return res
+
+
+def _edge_slice(states):
+    inside = np.in1d(states[:, 8:20], slice_edges).reshape((-1, 12))
+    return _mask_rank[(inside*2**np.arange(12)).sum(axis = 1)]
+
+
+def _edge_slice_states(coords):
+    inside = (_masks[np.asarray(coords)][:, np.newaxis] >> np.arange(12)) & 1
+    others = [e for e in range(12) if e not in slice_edges]
+    res = np.tile(solved, (len(coords), 1))
+    order = np.argsort(1 - inside, axis = 1, kind = 'mergesort')
+    cubies = np.array(slice_edges + others, dtype = np.uint8)
+    res[np.arange(len(coords))[:, np.newaxis], 8 + order] = cubies
+    return res
+
+
+# name: (number of values, coordinates of a batch of states, batch of states
+# of given coordinates)
+coordinates = {'corner_perm': (40320, _corner_perm, _corner_perm_states),
+               'corner_twist': (2187, _corner_twist, _corner_twist_states),
+               'edge_flip': (2048, _edge_flip, _edge_flip_states),
+               'edge_slice': (495, _edge_slice, _edge_slice_states)}
+
+_move_tables = {}
+
+
+def move_table(name):
+    """Returns the array of the coordinates reached by the moves of
+    Kube.fund_l, whose entry [c, k] is the coordinate name after the move k
+    from the coordinate c.
+
+    Parameters
+    ----------
+
+    name: str, name of the coordinate, a key of coordinates
+
+    """
+    if name not in _move_tables:
+        n, encode, decode = coordinates[name]
+        states = decode(np.arange(n))
+        res = np.empty((n, len(index)), dtype = np.int32)
+        for k in range(len(index)):
+            res[:, k] = encode(states[:, index[k]])
+        _move_tables[name] = res
+    return _move_tables[name]
+
+
+def size(names):
+    """Returns the number of entries of the table of the coordinates names."""
+    return int(np.prod([coordinates[c][0] for c in names]))
+
+
+def entry(names, states):
+    """Returns the entries of the table of the coordinates names of a Nx68
+    array of states."""
+    res = np.zeros(len(states), dtype = np.int64)
+    for c in names:
+        res = res*coordinates[c][0] + coordinates[c][1](states)
+    return res
+
+
+def _neighbours(names, entries):
+    """Returns the len(entries)x18 array of the entries of the table of the
+    coordinates names reached by the moves of Kube.fund_l."""
+    res = np.zeros((len(entries), len(index)), dtype = np.int64)
+    rest = np.asarray(entries, dtype = np.int64)
+    for c in names[::-1]:
+        n = coordinates[c][0]
+        # the first coordinate varies the slowest
+        res += move_table(c)[rest % n]*(size(names[names.index(c)+1:]))
+        rest = rest//n
+    return res
+
+
+def _bits(bitset, entries):
+    """Returns the bits of the entries of a bitset."""
+    return (bitset[entries >> 3] >> (7 - (entries & 7))) & 1
+
+
+def expand_chunk(args):
+    """Expands the entries start to stop of the layer depth of a table.
+    Returns the number of entries reached at depth+1, which may be counted
+    by several processes.
+
+    Parameters
+    ----------
+
+    args: tuple (names, path, depth, start, stop, backwards) where path is
+    the name of the table file, the bitset of the layer being in the file
+    path + '.layer'. If backwards is True, the unreached entries of the chunk
+    look for a neighbour in the layer, otherwise the entries of the layer in
+    the chunk mark their unreached neighbours.
+
+    """
+    names, path, depth, start, stop, backwards = args
+    total = size(names)
+    dist = np.memmap(path, dtype = np.uint8, mode = 'r+', shape = (total,))
+    layer = np.memmap(path + '.layer', dtype = np.uint8, mode = 'r',
+                      shape = ((total + 7)//8,))
+    if backwards:
+        todo = start + np.nonzero(dist[start:stop] == unreached)[0]
+        near = _bits(layer, _neighbours(names, todo)).any(axis = 1)
+        dist[todo[near]] = depth + 1
+        res = int(near.sum())
+    else:
+        bits = np.unpackbits(layer[start//8:(stop + 7)//8])[:stop - start]
+        reached = np.unique(_neighbours(names, start + np.nonzero(bits)[0]))
+        # the other processes may write the same entries, but with the same
+        # value
+        new = reached[dist[reached] == unreached]
+        dist[new] = depth + 1
+        res = len(new)
+    dist.flush()
+    return res
+
+
+def mark_chunk(args):
+    """Writes the bitset of the entries start to stop at a given depth in
+    the layer file of a table. Returns the number of these entries.
+
+    Parameters
+    ----------
+
+    args: tuple (names, path, depth, start, stop), start being a multiple of
+    8
+
+    """
+    names, path, depth, start, stop = args
+    total = size(names)
+    dist = np.memmap(path, dtype = np.uint8, mode = 'r', shape = (total,))
+    layer = np.memmap(path + '.layer', dtype = np.uint8, mode = 'r+',
+                      shape = ((total + 7)//8,))
+    at_depth = dist[start:stop] == depth
+    layer[start//8:(stop + 7)//8] = np.packbits(at_depth)
+    layer.flush()
+    return int(at_depth.sum())
+
+
+def _histogram(dist, chunk):
+    """Returns the number of entries of each value of a table."""
+    res = np.zeros(256, dtype = np.int64)
+    for s in range(0, len(dist), chunk):
+        res += np.bincount(dist[s:s + chunk], minlength = 256)
+    return res
+
+
+def _resume(names, path, chunk):
+    """Returns the depth of the last layer recorded in the checkpoint of a
+    table and the numbers of entries of the layers before it, or (0, []) if
+    there is no checkpoint. Raises a ValueError if the table does not match
+    its checkpoint."""
+    ckpt = jobs.load_checkpoint(path + '.ckpt')
+    if ckpt is None or not os.path.exists(path):
+        return 0, []
+    if ckpt['names'] != names or os.path.getsize(path) != size(names):
+        raise ValueError("{0} does not match {1}".format(path + '.ckpt',
+                                                         path))
+    depth, counts = ckpt['depth'], ckpt['counts']
+    # the expansion of the layer depth may have written some entries of the
+    # next layer, with their right distance, but nothing else may differ
+    hist = _histogram(load(names, path), chunk)
+    if (list(hist[:depth+1]) != counts or 
+        hist[depth+2:unreached].any()):
+        raise ValueError("{0} does not match {1}".format(path, 
+                                                         path + '.ckpt'))
+    return depth, counts[:depth]
+
+
+def build(names, path, processes = 1, chunk = 2**18, verbose = True,
+          resume = False):
+    """Builds the table of the distances, in moves of Kube.fund_l, from the
+    solved cube of all the values of a product of coordinates, and returns
+    it as a memory mapped array. The entry of the coordinates (c0, c1, ...)
+    is c0*n1*n2... + c1*n2... + ..., ni being the number of values of the
+    coordinate i.
+
+    Parameters
+    ----------
+
+    names: list of str, names of the coordinates, keys of coordinates
+
+    path: str, name of the file of the table, one uint8 per entry
+
+    processes: (optional) int, number of processes expanding the chunks
+
+    chunk: (optional) int, number of entries expanded by a process at a
+    time, a multiple of 8
+
+    verbose: (optional) bool, if True the size of each layer is printed
+
+    resume: (optional) bool, if True a build which was stopped resumes from
+    its last checkpoint, the file path + '.ckpt' written before the
+    expansion of each layer. The layer itself is the set of the entries of
+    the table at its depth, so that the table is its own snapshot: it is
+    checked against the numbers of entries of the layers recorded in the
+    checkpoint.
+
+    """
+    # the chunks share the bytes of the bitset of the layers
+    if chunk <= 0 or chunk % 8 != 0:
+        raise ValueError("the chunk size must be a positive multiple of 8, "
+                         "not {0}".format(chunk))
+    names = list(names)
+    total = size(names)
+    # the move tables are built once, before the processes are forked
+    for c in names:
+        move_table(c)
+    depth, counts = 0, []
+    if resume:
+        depth, counts = _resume(names, path, chunk)
+    if depth == 0:
+        dist = np.memmap(path, dtype = np.uint8, mode = 'w+',
+                         shape = (total,))
+        dist[:] = unreached
+        dist[entry(names, solved[np.newaxis, :])[0]] = 0
+        dist.flush()
+        del dist
+    elif verbose:
+        print "resuming at depth {0}".format(depth)
+    layer = np.memmap(path + '.layer', dtype = np.uint8, mode = 'w+',
+                      shape = ((total + 7)//8,))
+    del layer
+
+    bounds = [(s, min(s + chunk, total)) for s in range(0, total, chunk)]
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        run = pool.map
+    else:
+        pool = None
+        run = map
+    reached, t = sum(counts), time.time()
+    while True:
+        count = sum(run(mark_chunk, [(names, path, depth, s, e)
+                                     for s, e in bounds]))
+        if count == 0:
+            break
+        reached += count
+        counts.append(count)
+        jobs.save_checkpoint(path + '.ckpt', {'names': names, 
+                                              'depth': depth,
+                                              'counts': counts})
+        if verbose:
+            print "depth {0}: {1} entries ({2:.1f} s)".format(depth, count,
+                                                             time.time() - t)
+        t = time.time()
+        backwards = count > total - reached
+        run(expand_chunk, [(names, path, depth, s, e, backwards)
+                           for s, e in bounds])
+        depth += 1
+    if pool is not None:
+        pool.close()
+        pool.join()
+    os.remove(path + '.layer')
+    os.remove(path + '.ckpt')
+    return load(names, path)
+
+
+def load(names, path):
+    """Returns the read only memory mapped table of the coordinates names
+    stored in the file path."""
+    return np.memmap(path, dtype = np.uint8, mode = 'r',
+                     shape = (size(names),))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Builds the table of the "
+                                     "distances from the solved cube of a "
+                                     "product of coordinates.")
+    parser.add_argument("names", nargs = "+", choices = sorted(coordinates))
+    parser.add_argument("--output", required = True)
+    parser.add_argument("--processes", type = int, default = 1)
+    parser.add_argument("--chunk", type = int, default = 2**18)
+    parser.add_argument("--resume", action = "store_true", help = "resume "
+                        "a build which was stopped")
+    args = parser.parse_args()
+    build(args.names, args.output, args.processes, args.chunk,
+          resume = args.resume)
+    sys.exit(0)
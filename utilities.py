@@ -7,6 +7,8 @@ Classes
 
 move class: formalizes Rubik's cube moves
 
+kernel class: compiled effect of a move, applied to many states at once
+
 functions
 ---------
 
@@ -20,6 +22,12 @@ conjugate: generates the conjugate of two move elements
 
 commutator: generates the commutator of two move elements
 
+solve_corner_pos, pivot_corner_cubies, solve_edge_pos, pivot_edge_cubies: 
+return the move solving one phase of the resolution
+
+iter_corner_pos, iter_corner_cubies, iter_edge_pos, iter_edge_cubies: yield 
+one at a time the conjugated macros making up the corresponding phase
+
 Examples
 --------
 
@@ -37,8 +45,6 @@ Created on Thu Dec 11 21:35:39 2014
 
 import numpy as np
 
-from scipy import linalg
-
 
 def Rq(theta, vect):
     """Returns a 3x3 matrix representing a rotation of angle theta about vect 
@@ -195,8 +201,8 @@ rvard.edu/~jjchen/docs/Group%20Theory%20and%20the%20Rubik%27s%20Cube.pdf
         * P2 : list of integers representing a permutation of the orientations 
         of the 12 edge cubies as described in [1]
         
-        * seq : list of characters, corresponding to the decomposition of the 
-        move in fundamental moves
+        * seq : (optional) list of characters, corresponding to the 
+        decomposition of the move in fundamental moves, empty by default
         
         Examples
         --------
@@ -247,22 +253,37 @@ rvard.edu/~jjchen/docs/Group%20Theory%20and%20the%20Rubik%27s%20Cube.pdf
             self.S2 = np.matrix(np.eye(2*12)) 
 
         
-        try:
-            self.decompo = kwargs['seq']
-        except NameError:
-            print "to build a move object a list of characters, corresponding \
-            to the decomposition of the move in fundamental moves, must be \
-            provided."
-                        
-      
-        self.make_M()
+        self.decompo = list(kwargs.get('seq', []))
 
 
     def make_M(self):
-        res = linalg.block_diag(self.A8, self.A12)
-        res = linalg.block_diag(res, self.S3)
-        res = linalg.block_diag(res, self.S2)
+        """Builds the 68x68 block diagonal matrix M acting on the whole state
+        of the cube."""
+        res = np.zeros((68, 68))
+        res[:8, :8] = self.A8
+        res[8:20, 8:20] = self.A12
+        res[20:44, 20:44] = self.S3
+        res[44:, 44:] = self.S2
         self.M = np.matrix(res)
+
+
+    def to_index(self):
+        """Returns the array of 68 integers index such that the move sends the
+        state Y of the cube to Y[index], which is the same as M*Y but with a 
+        single gather instead of a matrix product."""
+        return np.concatenate([np.argmax(np.asarray(self.A8), axis = 1),
+                               8 + np.argmax(np.asarray(self.A12), axis = 1),
+                               20 + np.argmax(np.asarray(self.S3), axis = 1),
+                               44 + np.argmax(np.asarray(self.S2), axis = 1)])
+
+
+    def __getattr__(self, name):
+        # M is only built the first time it is needed, most of the moves 
+        # built while searching never use it
+        if name == 'M':
+            self.make_M()
+            return self.M
+        raise AttributeError(name)
     
     
     def __pow__(self, expo):
@@ -315,13 +336,53 @@ rvard.edu/~jjchen/docs/Group%20Theory%20and%20the%20Rubik%27s%20Cube.pdf
         return format(corner_pos)+'\n'+format(edge_pos)+'\n'+\
         format(corner_value)+'\n'+format(edge_value)
 
+
+
+class kernel():
+    """Compiled effect of a move on the 68 entries state of the cube: the 
+    move sends the state Y to Y[index]. Kernels are immutable, so that a 
+    single kernel can be shared by all the users of the same sequence.
+    
+    Attributes
+    ----------
+    
+    index : read only array of 68 integers, gather applying the move
+    
+    decompo : tuple of characters, decomposition of the move in fundamental 
+    moves
+    
+    """
+    def __init__(self, index, decompo = ()):
+        self.index = np.array(index, dtype = np.intp)
+        self.index.flags.writeable = False
+        self.decompo = tuple(decompo)
+    
+    
+    def __mul__(self, other):
+        """Returns the kernel of the move other followed by self, as for 
+        move objects."""
+        return kernel(other.index[self.index], other.decompo + self.decompo)
+    
+    
+    def apply(self, states):
+        """Returns the states moved by a single gather, states being either
+        a Nx68 array of states or a 68x1 matrix."""
+        states = np.asanyarray(states)
+        if states.ndim == 2 and states.shape[1] == 1:
+            return states[self.index]
+        return np.take(states, self.index, axis = -1)
+
         
 def send_8(cb1, cb2, cl1, cl2, auth, maxMove = 5, n_combi = 1, 
-           prev = [move(seq = [])]):
+           prev = None, key = None):
     """Returns a move that sends corner cubies cb1 and cb2 to corner cubicles
-    cl1 and cl2 or to cubicles cl2 and cl1
+    cl1 and cl2 or to cubicles cl2 and cl1, the first one found among the 
+    shortest moves or, if the function key is given, the one of lowest key
+    among them
     
     """
+    if prev is None:
+        prev = [move(seq = [])]
     if n_combi > maxMove:
         print "Oops!.. The maximum number of allowed moves is reached ({0}). \
         If you want to go further, you have to set MaxMove to some greater \
@@ -329,7 +390,7 @@ def send_8(cb1, cb2, cl1, cl2, auth, maxMove = 5, n_combi = 1,
         return None
     Y = np.transpose(np.matrix(np.array(range(8))))
     if n_combi == 1:
-        fact = [move(seq = [])] + auth
+        fact = [move(seq = [])] + list(auth)
     else:
         fact = auth
     cur = []
@@ -344,21 +405,29 @@ def send_8(cb1, cb2, cl1, cl2, auth, maxMove = 5, n_combi = 1,
                 or m.decompo[0]==g.decompo[-1]):
                     cur.append(m*g)
     
+    hits = []
     for m in cur:
         y = m.A8*Y
         if (((y[cl1]==cb1) and (y[cl2]==cb2)) or ((y[cl1]==cb2) and 
         (y[cl2]==cb1))):
-            return m
+            if key is None:
+                return m
+            hits.append(m)
+    if hits:
+        return min(hits, key = key)
     return send_8(cb1, cb2, cl1, cl2, auth, maxMove, n_combi+1, 
-           [m for m in cur if m.decompo!=[]])
+           [m for m in cur if m.decompo!=[]], key)
 
 
 def send_8_slow(cb1, cb2, cl1, cl2, auth, maxMove = 5, n_combi = 1, 
-           prev = [move(seq = [])]):
+           prev = None, key = None):
     """Returns a move that sends corner cubies cb1 and cb2 respectively to 
-    corner cubicles cl1 and cl2
+    corner cubicles cl1 and cl2, the first one found among the shortest moves
+    or, if the function key is given, the one of lowest key among them
     
     """
+    if prev is None:
+        prev = [move(seq = [])]
     if n_combi > maxMove:
         print "Oops!.. The maximum number of allowed moves is reached ({0}). \
         If you want to go further, you have to set MaxMove to some greater \
@@ -366,7 +435,7 @@ def send_8_slow(cb1, cb2, cl1, cl2, auth, maxMove = 5, n_combi = 1,
         return None
     Y = np.transpose(np.matrix(np.array(range(8))))
     if n_combi == 1:
-        fact = [move(seq = [])] + auth
+        fact = [move(seq = [])] + list(auth)
     else:
         fact = auth
     cur = []
@@ -381,20 +450,27 @@ def send_8_slow(cb1, cb2, cl1, cl2, auth, maxMove = 5, n_combi = 1,
                 or m.decompo[0]==g.decompo[-1]):
                     cur.append(m*g)
     
+    hits = []
     for m in cur:
         y = m.A8*Y
         if ((y[cl1]==cb1) and (y[cl2]==cb2)):
-            return m
+            if key is None:
+                return m
+            hits.append(m)
+    if hits:
+        return min(hits, key = key)
     return send_8_slow(cb1, cb2, cl1, cl2, auth, maxMove, n_combi+1, 
-           [m for m in cur if m.decompo!=[]])
+           [m for m in cur if m.decompo!=[]], key)
 
 
 def send_12(cb1, cb2, cb3, cl1, cl2, auth, maxMove = 3, n_combi = 1, 
-           prev = [move(seq = [])]):
+           prev = None):
     """Returns a move that sends edge cubies cb1, cb2 and cb3 respectively
     to edge cubicles cl1, cl2 and cl3
     
     """
+    if prev is None:
+        prev = [move(seq = [])]
     if n_combi > maxMove:
 #        print "Oops!.. The maximum number of allowed moves is reached ({0}). \
 #If you want to go further, you have to set MaxMove to some greater \
@@ -402,7 +478,7 @@ def send_12(cb1, cb2, cb3, cl1, cl2, auth, maxMove = 3, n_combi = 1,
         return None
     Y = np.transpose(np.matrix(np.array(range(12))))
     if n_combi == 1:
-        fact = [move(seq = [])] + auth
+        fact = [move(seq = [])] + list(auth)
     else:
         fact = auth
     cur = []
@@ -424,12 +500,64 @@ def send_12(cb1, cb2, cb3, cl1, cl2, auth, maxMove = 3, n_combi = 1,
            [m for m in cur if m.decompo!=[]])    
 
 
+def send_12_any(goals, cl1, cl2, auth, maxMove = 3, free = None):
+    """Searches at once moves for several goals, each goal (cb1, cb2, cb3) 
+    being to send edge cubies cb1, cb2 and cb3 respectively to edge cubicles
+    cl1, cl2 and to any cubicle of the list free, the cubicles after cl1 by
+    default as send_12 does. 
+    
+    The candidate moves of each length are built only once and checked 
+    against all the goals. Returns the list of the pairs (k, G) where G is 
+    the first move found for the goal of index k, for all the goals reached 
+    by the shortest moves, or an empty list if none is reached within 
+    maxMove moves.
+    
+    """
+    Y = np.transpose(np.matrix(np.array(range(12))))
+    if free is None:
+        free = range(cl1+1, 12)
+    prev = [move(seq = [])]
+    for n_combi in range(1, maxMove+1):
+        if n_combi == 1:
+            fact = [move(seq = [])] + list(auth)
+        else:
+            fact = auth
+        cur = []
+        for m in fact:
+            for g in prev:
+                if n_combi == 1:
+                    cur.append(m*g)
+                else:
+                    if not((m.decompo[0].upper()==m.decompo[0] and 
+                    g.decompo[-1]==m.decompo[0].lower()) or 
+                    (m.decompo[0].lower()==m.decompo[0] and 
+                    g.decompo[-1]==m.decompo[0].upper()) 
+                    or m.decompo[0]==g.decompo[-1]):
+                        cur.append(m*g)
+        found = {}
+        for m in cur:
+            y = m.A12*Y
+            for k, (cb1, cb2, cb3) in enumerate(goals):
+                if (k not in found and (y[cl1]==cb1) and (y[cl2]==cb2) and 
+                (float(cb3) in y[free])):
+                    found[k] = m
+            if len(found) == len(goals):
+                break
+        if found:
+            return sorted(found.items())
+        prev = [m for m in cur if m.decompo!=[]]
+    return []
+
+
 def send_12_slow(cb1, cb2, cl1, cl2, auth, maxMove = 3, n_combi = 1, 
-           prev = [move(seq = [])]):
+           prev = None, key = None):
     """Returns a move that sends edge cubies cb1 and cb2 respectively
-    to edge cubicles cl1 and cl2
+    to edge cubicles cl1 and cl2, the first one found among the shortest 
+    moves or, if the function key is given, the one of lowest key among them
     
     """
+    if prev is None:
+        prev = [move(seq = [])]
     if n_combi > maxMove:
         print "Oops!.. The maximum number of allowed moves is reached ({0}). \
 If you want to go further, you have to set MaxMove to some greater \
@@ -437,7 +565,7 @@ value".format(maxMove)
         return None
     Y = np.transpose(np.matrix(np.array(range(12))))
     if n_combi == 1:
-        fact = [move(seq = [])] + auth
+        fact = [move(seq = [])] + list(auth)
     else:
         fact = auth
     cur = []
@@ -451,75 +579,189 @@ value".format(maxMove)
                 ==m.decompo[0] and g.decompo[-1]==m.decompo[0].upper()) 
                 or m.decompo[0]==g.decompo[-1]):
                     cur.append(m*g)
+    hits = []
     for m in cur:
         y = m.A12*Y
         if ((y[cl1]==cb1) and (y[cl2]==cb2)):
-            return m
+            if key is None:
+                return m
+            hits.append(m)
+    if hits:
+        return min(hits, key = key)
     return send_12_slow(cb1, cb2, cl1, cl2, auth, maxMove, n_combi+1, 
-           [m for m in cur if m.decompo!=[]])    
+           [m for m in cur if m.decompo!=[]], key)    
 
 
-def solve_corner_pos(Y, switcher, c1, c2, auth):
-    """Returns a move that brings back the corner cubies from the position Y
-    to their unoriented starting position.
+def _product(moves):
+    """Returns the move obtained by applying the moves of an iterable one 
+    after the other.
     
     """
-    y = np.matrix(np.copy(Y))
     res = move(seq =[])
-    for i in range(8):
+    for next_move in moves:
+        res = next_move*res
+    return res
+
+
+def _cheapest(cost, make):
+    """Returns the key choosing, among the moves G found by a search, the one
+    for which the move make(G) has the lowest cost, or None when the cost is
+    the length, all the moves found having then the same cost."""
+    if cost is len:
+        return None
+    return lambda G: cost(make(G).decompo)
+
+
+def iter_corner_pos(Y, switcher, c1, c2, auth, cubicles = range(8), 
+                    cost = len):
+    """Yields, one at a time, the conjugated switchers that bring back the 
+    corner cubies from the position Y to their unoriented starting position.
+    
+    Only the cubies of the cubicles of the list cubicles are brought back, 
+    the others being moved at will. The conjugate of lowest cost among the 
+    shortest ones wins, the cost of a list of chars being its length by 
+    default.
+    
+    """
+    y = np.matrix(np.copy(Y))
+    key = _cheapest(cost, lambda G: conjugate(switcher, G))
+    for i in cubicles:
         if y[i]!=i:
-            j = [k for k in range(i+1,len(y)) if int(y[k])==i][0]
-            G = send_8(c1, c2, i, j, auth)
+            j = [k for k in range(len(y)) if int(y[k])==i][0]
+            G = send_8(c1, c2, i, j, auth, key = key)
             next_move = conjugate(switcher, G)
-            res = next_move*res
             y = next_move.A8*y
+            yield next_move
 
-    return res
+
+def solve_corner_pos(Y, switcher, c1, c2, auth):
+    """Returns a move that brings back the corner cubies from the position Y
+    to their unoriented starting position.
+    
+    """
+    return _product(iter_corner_pos(Y, switcher, c1, c2, auth))
 
 
-def pivot_corner_cubies(Y, flipper, c2, auth):
-    """Returns a move that brings back the corner cubies from the orientation Y
-    to their starting orientation without changing their position.
+def iter_corner_cubies(Y, flipper, c2, auth, cubicles = range(1,8), 
+                       buffer = 0, cost = len):
+    """Yields, one at a time, the conjugated flippers that bring back the 
+    corner cubies from the orientation Y to their starting orientation without
+    changing their position.
+    
+    Only the cubies of the cubicles of the list cubicles are brought back, 
+    the twists being compensated on the cubicle 0. When the cubicle 0 is in 
+    the list, its twist is compensated at last on the cubicle buffer. The 
+    conjugate of lowest cost among the shortest ones wins, the cost of a list
+    of chars being its length by default.
     
     """
     y = np.matrix(np.copy(Y))
-    res = move(seq =[])
-    for i in range(1,8):
+    for i in cubicles:
+        if i == 0:
+            continue
         if y[3*i]==2:
-            G = send_8_slow(0, c2, 0, i, auth)
+            key = _cheapest(cost, lambda G: conjugate(flipper, G))
+            G = send_8_slow(0, c2, 0, i, auth, key = key)
             next_move = conjugate(flipper, G)
-            res = next_move*res
             y = next_move.S3*y
+            yield next_move
         elif y[3*i]==1:
-            G = send_8_slow(0, c2, 0, i, auth)
+            key = _cheapest(cost, lambda G: conjugate(flipper, G)**2)
+            G = send_8_slow(0, c2, 0, i, auth, key = key)
             next_move = conjugate(flipper, G)**2
-            res = next_move*res
             y = next_move.S3*y
-    return res        
+            yield next_move
+    if 0 in cubicles and y[0]!=0:
+        def twist(G):
+            next_move = conjugate(flipper, G)
+            if (next_move.S3*y)[0]!=0:
+                next_move = next_move**2
+            return next_move
+        G = send_8_slow(0, c2, 0, buffer, auth, key = _cheapest(cost, twist))
+        yield twist(G)
 
+
+def pivot_corner_cubies(Y, flipper, c2, auth):
+    """Returns a move that brings back the corner cubies from the orientation Y
+    to their starting orientation without changing their position.
     
-def solve_edge_pos(Y, switcher_l, c_l, auth):
-    """Returns a move that brings back the corner cubies from the position Y
-    to their unoriented starting position.
+    """
+    return _product(iter_corner_cubies(Y, flipper, c2, auth))
+
+    
+def iter_edge_pos(Y, switcher_l, c_l, auth, cubicles = range(10), 
+                  cost = len):
+    """Yields, one at a time, the conjugated switchers that bring back the 
+    edge cubies from the position Y to their unoriented starting position.
+    
+    The switchers of switcher_l, with their cubies c_l, are all looked for 
+    in the same search and the conjugate of lowest cost wins, the cost of a 
+    list of chars being its length by default.
+    
+    Only the cubies of the cubicles of the list cubicles are brought back, 
+    the others being moved at will. The last two cubicles need not be in the
+    list when all the others are, the parity of the edges being the one of
+    the corners. A ValueError is raised if no switcher is found within 4
+    moves.
     
     """
     y = np.matrix(np.copy(Y))
-    res = move(seq =[])
-    for i in range(10):
+    done = []
+    for i in cubicles:
         if y[i]!=i:
-            j = [k for k in range(i+1,len(y)) if int(y[k])==i][0]
-            for k in range(len(c_l)):
-                G = send_12(c_l[k][0], c_l[k][1], c_l[k][2], i, j, auth)
-                if G!=None:
-                    next_move = conjugate(switcher_l[k], G)
-                    break
-#                else:
-#                    print "I was not able to use the edge switcher number {0},\
-# I am trying the next one".format(k)
-            res = next_move*res
+            j = [k for k in range(len(y)) if int(y[k])==i][0]
+            # a single search for all the switchers, the cheapest conjugate 
+            # among those found with the fewest moves wins, the third cubie
+            # of the cycle being taken out of the cubicles not yet done
+            free = [k for k in range(len(y)) if k != i and k not in done]
+            found = send_12_any(c_l, i, j, auth, free = free)
+            if not found:
+                # few free cubicles may need a longer conjugation
+                found = send_12_any(c_l, i, j, auth, maxMove = 4,
+                                    free = free)
+            if not found:
+                raise ValueError("no switcher brings the edge cubie {0} "
+                                 "from the cubicle {1} to the cubicle {2} "
+                                 "within 4 moves".format(i, j, i))
+            next_move = min([conjugate(switcher_l[k], G) for k, G in found],
+                            key = lambda m: cost(m.decompo))
             y = next_move.A12*y
+            yield next_move
+        done.append(i)
 
-    return res
+
+def solve_edge_pos(Y, switcher_l, c_l, auth):
+    """Returns a move that brings back the edge cubies from the position Y
+    to their unoriented starting position.
+    
+    """
+    return _product(iter_edge_pos(Y, switcher_l, c_l, auth))
+
+
+def iter_edge_cubies(Y, flipper, c2, auth, cubicles = range(1,12), 
+                     buffer = 0, cost = len):
+    """Yields, one at a time, the conjugated flippers that bring back the edge 
+    cubies from the orientation Y to their starting orientation without 
+    changing neither their position nor any other cubie.
+    
+    Only the cubies of the cubicles of the list cubicles are brought back, 
+    the flips being compensated on the cubicle 0. When the cubicle 0 is in 
+    the list, its flip is compensated at last on the cubicle buffer. The 
+    conjugate of lowest cost among the shortest ones wins, the cost of a list
+    of chars being its length by default.
+    
+    """
+    y = np.matrix(np.copy(Y))
+    key = _cheapest(cost, lambda G: conjugate(flipper, G))
+    for i in cubicles:
+        if i != 0 and y[2*i]!=0:
+            G = send_12_slow(0, c2, 0, i, auth, key = key)
+            next_move = conjugate(flipper, G)
+            y = next_move.S2*y
+            yield next_move
+    if 0 in cubicles and y[0]!=0:
+        G = send_12_slow(0, c2, 0, buffer, auth, key = key)
+        yield conjugate(flipper, G)
 
 
 def pivot_edge_cubies(Y, flipper, c2, auth):
@@ -528,12 +770,4 @@ def pivot_edge_cubies(Y, flipper, c2, auth):
     any other cubie.
     
     """
-    y = np.matrix(np.copy(Y))
-    res = move(seq =[])
-    for i in range(1,12):
-        if y[2*i]!=0:
-            G = send_12_slow(0, c2, 0, i, auth)
-            next_move = conjugate(flipper, G)
-            res = next_move*res
-            y = next_move.S2*y
-    return res 
\ No newline at end of file
+    return _product(iter_edge_cubies(Y, flipper, c2, auth))
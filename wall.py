@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Animated wall of Rubik's cubes using PyOpenGL library, to replay a batch of
+move sequences simultaneously.
+
+Description
+-----------
+
+Running this program will display a window with a grid of cubes, each of
+them replaying its own move sequence, all of them in step.
+
+The states of the cubies of all the cubes are held in contiguous arrays by a
+single animation.cubies object. Every frame, the vertices of all the cubies
+are transformed at once by NumPy from the geometry of one cube and the
+rotation of each cubie, then drawn with a single call from client side
+vertex arrays, so that a wall of 64 cubes still animates at interactive frame
+rates.
+
+Usage
+-----
+
+Replay the sequences of a file, one sequence of fundamental moves (e.g.
+FRUfru) per line::
+
+$ python wall.py sequences.txt
+
+or replay n random sequences::
+
+$ python wall.py --random 64
+
+When the window pops up you may control it by using your keyboard. In
+particular you can:
+    * Change the camera point of view by using the arrow keys
+    * double (respectively halve) the playback rate by pressing the `+`
+    (resp. `-`) key
+    * jump to the end of the sequences by pressing the `j` key
+    * quit and close the window by pressing the `q` or `esc` key
+
+"""
+
+# the next two lines are here to avoid spurious message being printed
+import logging
+logging.getLogger('OpenGL').addHandler(logging.NullHandler())
+
+import sys
+import time
+import argparse
+
+from OpenGL.GL import *
+from OpenGL.GLU import *
+from OpenGL.GLUT import *
+
+import numpy as np
+
+import quaternion as quat
+import geometry as geo
+import animation as anim
+import Kube as kb
+
+# Set the width and height of the window
+global width
+global height
+
+width = 800
+height = 800
+
+# width of the cell of a cube in the grid
+cell = 3.0
+
+# Global variables for movements
+global xrot, yrot
+global cubes, sched, sequences, cur_mov, offsets
+global mesg
+
+xrot = 45.0
+yrot = 45.0
+
+mesg = ""
+
+cur_mov = 0
+
+sequences = []
+
+cubes = anim.cubies(0)
+
+offsets = np.zeros((0, 3))
+
+# each quarter turn lasts 0.25 s at playback rate 1, whatever the frame rate
+sched = anim.scheduler(duration = 0.25)
+
+# Light value and coordonates
+ambientLight = (0.35, 0.35, 0.35, 1.0)
+diffuseLight = ( 0.75, 0.75, 0.75, 0.7)
+specular = (1.0, 1.0, 1.0, 1.0)
+specref = (1.0, 1.0, 1.0, 1.0)
+
+# geometry of one cube, each quad is made of 4 vertices sharing its normal
+# and colour
+normals, colours, quads = geo.cubie_mesh()
+normals = np.repeat(normals, 4, axis = 1)
+colours = np.repeat(colours, 4, axis = 1)
+quads = quads.reshape((26, 48, 3))
+
+
+def load(seqs):
+    """Sets up the wall to replay the list of move sequences seqs."""
+    global sequences, cubes, offsets, cur_mov
+    global vertex_colours, nRange
+    sequences = [list(s) for s in seqs]
+    n = len(sequences)
+    cubes = anim.cubies(n)
+    cur_mov = 0
+    cols = int(np.ceil(np.sqrt(n)))
+    rows = int(np.ceil(float(n)/cols))
+    offsets = np.zeros((n, 3))
+    offsets[:, 0] = (np.arange(n) % cols - (cols - 1)/2.)*cell
+    offsets[:, 1] = ((rows - 1)/2. - np.arange(n)//cols)*cell
+    nRange = cell*max(rows, cols)/2.
+    vertex_colours = np.ascontiguousarray(np.tile(colours, (n, 1, 1)))
+
+
+def start_turn(now):
+    """Starts on every cube the move of index cur_mov of its sequence, if no
+    move is in progress and if any cube has one."""
+    if not sched.in_progress() and cur_mov < max([0]+map(len, sequences)):
+        cubes.make_moves([s[cur_mov] if cur_mov < len(s) else None
+                          for s in sequences])
+        sched.begin(now)
+
+
+def animate():
+    """Advances the moves to where they should be according to the clock."""
+    global cur_mov
+    now = time.time()
+    while sched.in_progress():
+        angle, complete = sched.step(now)
+        if complete:
+            cubes.advance(90.)
+            cur_mov += 1
+            start_turn(now)
+        else:
+            cubes.advance(angle)
+            break
+    if not sched.in_progress():
+        sched.skipping = False
+
+
+def renderscene():
+    """This function litterally prints the scene."""
+    start = time.time()
+    glClear(GL_COLOR_BUFFER_BIT|GL_DEPTH_BUFFER_BIT)
+    animate()
+
+    rotation_x = quat.quaternion([1.,0.,0.], angl=-xrot)
+    rotation_y = quat.quaternion([0.,1.,0.], angl=-yrot)
+    camera = np.dot(rotation_y.matrix, rotation_x.matrix)
+    # the transposes of the model view matrices the viewer would hand to
+    # OpenGL, applied to all the vertices of all the cubies at once
+    models = np.dot(cubes.quater.matrices(), camera)[:, :3, :3]
+    n = cubes.n
+    models = models.reshape((n, 26, 3, 3))
+    vertices = np.matmul(quads, models)
+    vertices = vertices + offsets[:, np.newaxis, np.newaxis, :]
+    vertex_normals = np.matmul(normals, models)
+    vertices = vertices.astype(np.float32)
+    vertex_normals = vertex_normals.astype(np.float32)
+
+    glLoadIdentity()
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, vertices)
+    glNormalPointer(GL_FLOAT, 0, vertex_normals)
+    glColorPointer(3, GL_UNSIGNED_BYTE, 0, vertex_colours)
+    glDrawArrays(GL_QUADS, 0, n*26*48)
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+    glColor3ub(0, 0, 100)
+    glRasterPos2f(-nRange + 0.1, -nRange + 0.1)
+    glutBitmapString(GLUT_BITMAP_HELVETICA_18, mesg)
+    glutSwapBuffers()
+    frame_time = time.time() - start
+    glutSetWindowTitle("Cubes ({0} cubes, {1:.1f} ms per frame)".format(n,
+                       1000.*frame_time))
+
+
+def init():
+    """Initiates the display paramters"""
+    glClearColor(1.0, 1.0, 1.0, 1.0)
+    glEnable(GL_DEPTH_TEST)
+    glEnable(GL_LIGHTING)
+    glEnable(GL_NORMALIZE)
+    glLightfv(GL_LIGHT0, GL_AMBIENT, ambientLight)
+    glLightfv(GL_LIGHT0, GL_DIFFUSE, diffuseLight)
+    glLightfv(GL_LIGHT0, GL_SPECULAR, specular)
+    glEnable(GL_LIGHT0)
+    glEnable(GL_COLOR_MATERIAL)
+    glColorMaterial(GL_FRONT, GL_AMBIENT_AND_DIFFUSE)
+    glMaterialfv(GL_FRONT, GL_SPECULAR, specref)
+    glMateriali(GL_FRONT, GL_SHININESS, 128)
+
+
+def specialkeys(key, x, y):
+    """Tells the program what to do when the arrow keys are pressed"""
+    global xrot, yrot
+
+    if key == GLUT_KEY_UP:
+        xrot = xrot - 2
+    if key == GLUT_KEY_DOWN:
+        xrot = xrot + 2
+    if key == GLUT_KEY_LEFT:
+        yrot -= 2.0
+    if key == GLUT_KEY_RIGHT:
+        yrot += 2.0
+    glutPostRedisplay()
+
+
+def sequence():
+    """This function is called by OpenGL when idle, as long as there are moves
+    to animate. It starts the next moves and asks for a new frame, then
+    unregisters itself once all the sequences are over."""
+    global mesg
+    longest = max([0]+map(len, sequences))
+    if cur_mov >= longest and not sched.in_progress():
+        mesg = "{0} moves replayed".format(longest)
+        glutIdleFunc(None)
+    else:
+        start_turn(time.time())
+        mesg = "move {0}/{1} (x{2:g})".format(cur_mov, longest, sched.rate)
+    glutPostRedisplay()
+
+
+def keyboard(key, x, y):
+    """When the user press keyboard keys (except arrrow keys), this function
+    updates accordingly the playback."""
+    if key == chr(27) or key == "q":
+        sys.exit()
+    if key == "+":
+        sched.set_rate(min(64., 2.*sched.rate), time.time())
+    if key == "-":
+        sched.set_rate(max(1./8, sched.rate/2.), time.time())
+    if key == "j":
+        sched.skipping = True
+    glutIdleFunc(sequence)
+    glutPostRedisplay()
+
+
+def reshape(w, h):
+    """Reshapes the scene when the window is resized."""
+    lightPos = (-50.0, 50.0, 100.0, 1.0)
+
+    if h==0:
+        h = 1
+    glViewport(0, 0, w, h)
+    glMatrixMode(GL_PROJECTION)
+
+    glLoadIdentity()
+
+    if w <= h:
+        glOrtho(-nRange, nRange, -nRange*h/w, nRange*h/w, -nRange, nRange)
+    else:
+        glOrtho(-nRange*w/h, nRange*w/h, -nRange, nRange, -nRange, nRange)
+
+    glMatrixMode(GL_MODELVIEW)
+    glLoadIdentity()
+    glLightfv(GL_LIGHT0, GL_POSITION, lightPos)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Replays a batch of move "
+                                     "sequences on a wall of cubes.")
+    parser.add_argument("file", nargs = "?", help = "file with one sequence "
+                        "of fundamental moves per line")
+    parser.add_argument("--random", type = int, default = 16, help = "number "
+                        "of random sequences replayed if no file is given")
+    parser.add_argument("--length", type = int, default = 30, help =
+                        "length of the random sequences")
+    args = parser.parse_args()
+
+    if args.file is not None:
+        with open(args.file) as f:
+            seqs = ["".join(line.split()) for line in f
+                    if line.strip() != ""]
+    else:
+        seqs = ["".join(kb.rand_move(args.length))
+                for i in range(args.random)]
+    load(seqs)
+
+    glutInitDisplayMode(GLUT_RGB|GLUT_DOUBLE|GLUT_DEPTH)
+    glutInitWindowPosition(100,100)
+    glutInitWindowSize(width,height)
+    glutInit(sys.argv)
+    glutCreateWindow("Cubes")
+
+    init()
+
+    glutReshapeFunc(reshape)
+    glutDisplayFunc(renderscene)
+    glutKeyboardFunc(keyboard)
+    glutSpecialFunc(specialkeys)
+    glutIdleFunc(sequence)
+    glutMainLoop()